@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, font
+from tkinter import filedialog, messagebox, font, ttk
 import tkinter.font as tkFont
 import xml.etree.ElementTree as ET
 import numpy as np
@@ -8,43 +8,306 @@ from PIL import Image, ImageTk
 import zlib
 import lz4.block
 import os
+import re
+import enum
+import functools
+import mmap
 import glob
+import hashlib
 import shutil
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 import webbrowser
 import threading # Für nebenläufiges Caching
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor, as_completed
 
 # Für FITS-Unterstützung: installiere via "pip install astropy"
 from astropy.io import fits
 
-# Optional: Bitshuffle für Shuffling (pip install bitshuffle)
+# Optional: fitsio (cfitsio) für schnelles Header-Lesen (pip install fitsio)
 try:
-    import bitshuffle
+    import fitsio
 except ImportError:
-    bitshuffle = None
+    fitsio = None
+
+# Optional: lxml für schnelles XPath auf dem XISF-Header (pip install lxml)
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
+
+# Optional: cramjam für LZ4-Dekompression in vorhandene Puffer (pip install cramjam)
+try:
+    import cramjam
+except ImportError:
+    cramjam = None
+
+# Optional: OpenCV für schnelles Verkleinern der Anzeige (pip install opencv-python-headless)
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Optional: numba für parallele Pixel-Kernel (pip install numba)
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Optional: zstandard für ZSTD-komprimierte XISF-Dateien neuerer PixInsight-Versionen (pip install zstandard)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 def open_link(url):
     webbrowser.open(url)
 
-def asinh_stretch(img_norm, stretch_factor):
+IMAGE_EXTENSIONS = (".xisf", ".xifs", ".fits")
+
+class FileKind(enum.IntEnum):
+    OTHER = 0
+    FITS = 1
+    XISF = 2
+
+_FILE_KINDS = {".fits": FileKind.FITS, ".xisf": FileKind.XISF, ".xifs": FileKind.XISF}
+
+def classify_file(file_path):
+    """Dateityp anhand der Endung, einmal bestimmt statt wiederholter lower().endswith()-Vergleiche."""
+    return _FILE_KINDS.get(os.path.splitext(file_path)[1].lower(), FileKind.OTHER)
+
+_SEP = "-" * 60 + "\n" # Trennlinie zwischen den Dateien in der Header-Vorschau
+
+# Widget-Stile der Header-Dialoge, einmal definiert statt bei jedem Öffnen neu zusammengestellt
+LABEL_KW = dict(fg="red", bg="black", font=("Arial", 12))
+ENTRY_KW = dict(fg="red", bg="black", insertbackground="red", font=("Arial", 12))
+BUTTON_KW = dict(fg="red", bg="black", activebackground="gray20", font=("Arial", 12))
+OPTIONMENU_KW = dict(fg="red", bg="black", activebackground="gray20", font=("Arial", 12), highlightthickness=0, borderwidth=1, relief="solid")
+OPTIONMENU_MENU_KW = dict(fg="red", bg="black", activebackground="gray20", font=("Arial", 11))
+
+# Im Header-Feld hervorgehobene Schlüssel
+WHITE_HEADERS_FITS = frozenset({"IMAGETYP", "EXPOSURE", "GAIN", "OFFSET", "CAMERAID", "FILTER", "DATE-OBS", "CCD-TEMP", "RA", "DEC", "OBJECT"})
+WHITE_HEADERS_XISF = WHITE_HEADERS_FITS | {"Instrument:Camera:Gain", "Instrument:Camera:Offset", "Observation:Time:Start"}
+
+def read_fits_header_cards(file_path):
+    """Karten des primären FITS-Headers als (Schlüssel, Wert, Kommentar); mit fitsio (C-Parser), sonst astropy."""
+    if fitsio is not None:
+        cards = []
+        for rec in fitsio.read_header(file_path, ext=0).records():
+            name = rec["name"]
+            # fitsio liefert bei COMMENT/HISTORY den Text auch als Kommentar
+            comment = "" if name in ("COMMENT", "HISTORY", "") else rec.get("comment", "")
+            cards.append((name, rec.get("value", ""), comment))
+        return cards
+    with fits.open(file_path) as hdulist:
+        # Eine Attributkette pro Karte statt header[key] + header.comments[key]
+        return [(card.keyword, card.value, card.comment) for card in hdulist[0].header.cards] # Nur primärer Header
+
+def read_fits_header_values(file_path, defaults):
+    """Liest einzelne Schlüssel des primären FITS-Headers; defaults bildet Schlüssel auf Vorgabewerte ab."""
+    if fitsio is not None:
+        header = fitsio.read_header(file_path, ext=0)
+    else:
+        header = fits.getheader(file_path, ext=0) # Liest nur die Header-Blöcke
+    return {key: header.get(key, default) for key, default in defaults.items()}
+
+def write_fits_header_values(file_path, values):
+    """Setzt Schlüssel im primären FITS-Header in einem Öffnen der Datei; die Bilddaten werden nicht geladen."""
+    if fitsio is not None:
+        # cfitsio ändert die Header-Karten direkt in der Datei
+        with fitsio.FITS(file_path, "rw") as fits_file:
+            for key, value in values.items():
+                fits_file[0].write_key(key, value)
+        return
+    # Wie fits.setval, aber einmal für alle Schlüssel statt einmal pro Schlüssel
+    with fits.open(file_path, mode="update") as hdulist:
+        header = hdulist[0].header
+        for key, value in values.items():
+            header[key] = value
+
+def scan_image_files(folder):
+    """Listet die Bilddateien eines Ordners als nach Namen sortierte (Pfad, Größe)-Paare in einem scandir-Durchlauf."""
+    entries = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            # Versteckte Dateien (z.B. macOS "._"-Dateien) wie bei glob überspringen
+            if entry.name.startswith(".") or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if entry.is_file():
+                entries.append((entry.path, entry.stat().st_size))
+    entries.sort(key=lambda e: e[0].lower())
+    return entries
+
+def same_filesystem(path_a, path_b):
+    """True, wenn beide Pfade auf demselben Dateisystem liegen (dann genügt ein Umbenennen)."""
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+def move_into_dir(file_path, dest_dir, same_fs):
+    """Verschiebt file_path nach dest_dir. Auf demselben Dateisystem ein einziger os.rename statt shutil.move."""
+    if not same_fs:
+        shutil.move(file_path, dest_dir)
+        return
+    dest_path = os.path.join(dest_dir, os.path.basename(file_path))
+    if os.path.exists(dest_path): # Wie shutil.move nie eine vorhandene Datei überschreiben
+        raise FileExistsError(f"Destination path '{dest_path}' already exists")
+    os.rename(file_path, dest_path)
+
+def asinh_stretch(img_norm, stretch_factor, out=None):
+    """asinh-Stretch; mit out (float32, gleiche Form) wird ohne Zwischen-Arrays in out gerechnet."""
     if stretch_factor <= 0:
-        return img_norm
-    return np.arcsinh(img_norm * stretch_factor) / np.arcsinh(stretch_factor)
-
-def parse_xisf_header(file_bytes):
-    xml_start = file_bytes.find(b"<?xml")
+        if out is None:
+            return img_norm
+        np.copyto(out, img_norm)
+        return out
+    out = np.multiply(img_norm, stretch_factor, out=out)
+    np.arcsinh(out, out=out)
+    np.true_divide(out, np.arcsinh(stretch_factor), out=out)
+    return out
+
+def block_sum(arr, factor):
+    """Verkleinert ein 2D-Bild um factor, indem factor x factor Blöcke aufsummiert werden (Rand wird abgeschnitten)."""
+    if factor <= 1:
+        return arr
+    height = arr.shape[0] // factor * factor
+    width = arr.shape[1] // factor * factor
+    blocks = arr[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    # Ganzzahlige Summe ist schneller als float-Mittelwert; die Normalisierung danach ist skalierungsinvariant
+    sum_dtype = np.uint64 if np.issubdtype(arr.dtype, np.integer) else np.float32
+    return blocks.sum(axis=(1, 3), dtype=sum_dtype)
+
+XISF_HEADER_SCAN_BYTES = 65536 # XISF-Header stehen am Dateianfang und sind normalerweise nur wenige KB groß
+
+# Öffnendes <Image ...>-Tag und dessen Attribute; erspart den ElementTree für die paar benötigten Werte
+_XISF_IMAGE_TAG_RE = re.compile(rb'<Image\b[^>]*>')
+_XML_ATTR_RE = re.compile(rb'([\w:.-]+)\s*=\s*"([^"]*)"')
+_GEOMETRY_RE = re.compile(r"(\d+)x(\d+)\+(-?\d+)\+(-?\d+)") # Tk-Geometrie "BxH+X+Y"
+
+def _xisf_image_attrs(xml_full):
+    """Liest die Attribute des <Image>-Elements, per Regex oder (Fallback) per ElementTree."""
+    m = _XISF_IMAGE_TAG_RE.search(xml_full)
+    if m is not None:
+        attrs = {k.decode("ascii"): v.decode("utf-8", errors="replace") for k, v in _XML_ATTR_RE.findall(m.group(0))}
+        if "geometry" in attrs:
+            return attrs
+    root = ET.fromstring(xml_full)
+    ns = {"n": "http://www.pixinsight.com/xisf"}
+    image_elem = root.find("n:Image", ns)
+    if image_elem is None:
+        raise ValueError("Kein <Image> Element gefunden.")
+    return image_elem.attrib
+
+XISF_SIGNATURE = b"XISF0100"
+
+def xisf_header_end(file_bytes):
+    """Ende des XML-Headers laut Längenfeld (Signatur + uint32 Länge + 4 reservierte Bytes), sonst Suchgrenze."""
+    if file_bytes[:8] == XISF_SIGNATURE and len(file_bytes) >= 16:
+        return 16 + int.from_bytes(file_bytes[8:12], "little")
+    return XISF_HEADER_SCAN_BYTES
+
+def read_xisf_header(file_path, need_xml_text=False):
+    """Liest genau den XML-Header einer XISF-Datei (Länge aus dem Dateikopf) und parst ihn."""
+    with open(file_path, "rb") as f:
+        file_bytes = f.read(16)
+        header_end = xisf_header_end(file_bytes)
+        file_bytes += f.read(header_end - len(file_bytes))
+    return parse_xisf_header(file_bytes, need_xml_text)
+
+XISF_READ_CHUNK = 8192 # Blockgröße beim Einlesen des XML-Headers
+
+def read_xisf_xml(file_path):
+    """Liest blockweise nur bis </xisf> und liefert (XML-Bytes, Start-Offset, End-Offset) des XML-Headers."""
+    end_tag = b"</xisf>"
+    buf = bytearray()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(XISF_READ_CHUNK)
+            if not chunk:
+                raise ValueError("Kein </xisf> Tag gefunden.")
+            search_from = max(0, len(buf) - len(end_tag) + 1) # End-Tag kann über die Blockgrenze reichen
+            buf += chunk
+            xml_end = buf.find(end_tag, search_from)
+            if xml_end >= 0:
+                break
+            if len(buf) >= 16 and len(buf) > xisf_header_end(buf) + len(end_tag):
+                raise ValueError("Kein </xisf> Tag im XISF-Header gefunden.")
+    xml_start = buf.find(b"<?xml", 0, xml_end)
+    if xml_start < 0:
+        raise ValueError("Kein XML-Header gefunden.")
+    xml_end += len(end_tag)
+    return bytes(buf[xml_start:xml_end]), xml_start, xml_end
+
+XISF_HEADER_RESERVE = 4096 # Freiraum hinter einem gewachsenen Header, damit spätere Änderungen wieder an Ort und Stelle passen
+XISF_BLOCK_ALIGN = 4096 # Datenblöcke nach dem Verschieben an Blockgrenzen ausrichten
+XISF_COPY_CHUNK = 16 * 1024 * 1024 # Puffergröße beim Umkopieren der Datenblöcke
+_XISF_ATTACHMENT_RE = re.compile(rb'(location="attachment:)(\d+)(:)')
+
+def write_xisf_xml(file_path, xml_bytes, xml_start, xml_end):
+    """Schreibt einen geänderten XML-Header zurück (Offsets wie von read_xisf_xml).
+    Passt er vor den ersten Datenblock, wird nur der Header-Bereich überschrieben. Sonst werden die Datenblöcke
+    über eine temporäre Datei nach hinten kopiert und ihre absoluten Positionen im Header angepasst."""
+    try:
+        _write_xisf_xml(file_path, xml_bytes, xml_start, xml_end)
+    finally:
+        # Gleich große Header-Änderung im selben mtime-Takt hätte denselben Schlüssel, daher Memo immer leeren
+        _cached_parse_xisf_header.cache_clear()
+
+def _write_xisf_xml(file_path, xml_bytes, xml_start, xml_end):
+    positions = [int(m.group(2)) for m in _XISF_ATTACHMENT_RE.finditer(xml_bytes)]
+    old_length = xml_end - xml_start
+    if not positions or xml_start + len(xml_bytes) <= min(positions):
+        with open(file_path, "r+b") as f:
+            if len(xml_bytes) != old_length and xml_start == 16 and f.read(8) == XISF_SIGNATURE:
+                f.write(len(xml_bytes).to_bytes(4, "little")) # Längenfeld direkt hinter der Signatur
+            f.seek(xml_start)
+            f.write(xml_bytes)
+            if len(xml_bytes) < old_length:
+                f.write(b"\0" * (old_length - len(xml_bytes))) # Rest des alten Headers wird Padding
+        return
+
+    data_start = min(positions)
+    new_data_start = xml_start + len(xml_bytes) + XISF_HEADER_RESERVE
+    new_data_start += -new_data_start % XISF_BLOCK_ALIGN
+    shift = new_data_start - data_start
+    # Die neuen Positionen haben höchstens ein paar Ziffern mehr, das fängt der Freiraum ab
+    xml_bytes = _XISF_ATTACHMENT_RE.sub(lambda m: m.group(1) + str(int(m.group(2)) + shift).encode() + m.group(3), xml_bytes)
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(file_path, "rb") as src, open(tmp_path, "wb") as dst:
+            head = bytearray(src.read(xml_start))
+            if xml_start == 16 and head[:8] == XISF_SIGNATURE:
+                head[8:12] = len(xml_bytes).to_bytes(4, "little")
+            dst.write(head)
+            dst.write(xml_bytes)
+            dst.write(b"\0" * (new_data_start - xml_start - len(xml_bytes)))
+            src.seek(data_start)
+            shutil.copyfileobj(src, dst, XISF_COPY_CHUNK) # Datenblöcke stückweise, nie die ganze Datei im Speicher
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def parse_xisf_header(file_bytes, need_xml_text=False):
+    # Nur innerhalb des Headers suchen (Längenfeld); volle Suche nur als Fallback für ungewöhnliche Dateien
+    scan_end = xisf_header_end(file_bytes)
+    xml_start = file_bytes.find(b"<?xml", 0, scan_end)
+    if xml_start < 0:
+        xml_start = file_bytes.find(b"<?xml")
     if xml_start < 0:
         raise ValueError("Kein XML-Header gefunden.")
     xml_end_tag = b"</xisf>"
-    xml_end = file_bytes.find(xml_end_tag, xml_start)
+    xml_end = file_bytes.find(xml_end_tag, xml_start, scan_end)
+    if xml_end < 0:
+        xml_end = file_bytes.find(xml_end_tag, xml_start)
     if xml_end < 0:
         raise ValueError("Kein </xisf> Tag gefunden.")
     xml_full = file_bytes[xml_start: xml_end + len(xml_end_tag)]
-    root = ET.fromstring(xml_full)
-    ns = {"n": "http://www.pixinsight.com/xisf"}
-    image_elem = root.find("n:Image", ns)
-    if image_elem is None:
-        raise ValueError("Kein <Image> Element gefunden.")
+    image_elem = _xisf_image_attrs(xml_full)
     geometry = image_elem.get("geometry")
     width, height, channels = map(int, geometry.split(":"))
     sample_format = image_elem.get("sampleFormat", "UInt16")
@@ -67,36 +330,318 @@ def parse_xisf_header(file_bytes):
                 item_size = int(comp_parts[1].split(":")[1])
             else:
                 uncompressed_size = width * height * bytes_per_pixel
-                item_size = 1
+                item_size = bytes_per_pixel
         except Exception:
             uncompressed_size = width * height * bytes_per_pixel
-            item_size = 1
+            item_size = bytes_per_pixel # Shuffle-Elementgröße = Sample-Größe
     else:
         uncompressed_size = width * height * bytes_per_pixel
-        item_size = 1
+        item_size = bytes_per_pixel
+    codec = compression.split(":")[0].split("+")[0] # z.B. "lz4+sh:..." -> "lz4"
     return {
         "width": width,
         "height": height,
         "channels": channels,
         "sample_format": sample_format,
         "compression": compression,
+        "codec": codec,
         "offset": data_offset,
         "compressed_size": compressed_size,
         "uncompressed_size": uncompressed_size,
         "item_size": item_size,
-        "xml_header": xml_full.decode("utf-8", errors="replace")
+        "xml_header": xml_full.decode("utf-8", errors="replace") if need_xml_text else None
     }
 
-def unshuffle_uint16(data):
+@functools.lru_cache(maxsize=1024)
+def _cached_parse_xisf_header(file_path, mtime_ns, size, need_xml_text=False):
+    """Geparster XISF-Header, gemerkt pro (Pfad, mtime, Größe); eine geänderte Datei ergibt einen neuen Schlüssel.
+    Das Ergebnis wird geteilt und darf nicht verändert werden.
+    Grenze: schreibt ein anderes Programm den Header in gleicher Größe innerhalb derselben mtime-Auflösung
+    des Dateisystems um, bleibt der alte Eintrag gültig. Eigene Änderungen leeren das Memo (write_xisf_xml)."""
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return parse_xisf_header(mm, need_xml_text)
+
+XISF_NS = "http://www.pixinsight.com/xisf"
+ET.register_namespace("", XISF_NS) # Beim Zurückschreiben <xisf> statt <ns0:xisf>, sonst fehlt das </xisf>-Ende
+if LET is not None:
+    # Einmal kompiliert, in C ausgewertet
+    _XP_FITS_KEYWORDS = LET.XPath("//x:FITSKeyword", namespaces={"x": XISF_NS})
+    _XP_PROPERTIES = LET.XPath("//x:Property", namespaces={"x": XISF_NS})
+
+_FITSKEYWORD_TAG = f"{{{XISF_NS}}}FITSKeyword" # Für root.iter(): ein linearer Durchlauf ohne XPath
+_PROPERTY_TAG = f"{{{XISF_NS}}}Property"
+_XISF_IMAGE_PATH = f".//{{{XISF_NS}}}Image"
+
+def parse_xisf_root(xml_header):
+    """Parst den XISF-XML-Header (str oder bytes) und liefert nur das Wurzelelement."""
+    if LET is not None:
+        return LET.fromstring(xml_header.encode("utf-8") if isinstance(xml_header, str) else xml_header)
+    return ET.fromstring(xml_header)
+
+def parse_xisf_xml(xml_header):
+    """Parst den XISF-XML-Header und liefert (root, FITSKeyword-Elemente, Property-Elemente)."""
+    root = parse_xisf_root(xml_header)
+    if LET is not None:
+        return root, _XP_FITS_KEYWORDS(root), _XP_PROPERTIES(root)
+    return root, list(root.iter(_FITSKEYWORD_TAG)), list(root.iter(_PROPERTY_TAG))
+
+def serialize_xisf_root(root):
+    """Serialisiert einen (geänderten) XISF-Header aus parse_xisf_root als UTF-8-Bytes mit XML-Deklaration."""
+    # Beide schreiben die Deklaration selbst und liefern direkt Bytes, kein Umweg über str
+    if LET is not None:
+        # lxml behält zusätzlich die Namespace-Präfixe des Originals
+        return LET.tostring(root, xml_declaration=True, encoding="UTF-8")
+    return ET.tostring(root, encoding="UTF-8", xml_declaration=True)
+
+def decompress_xisf_block(codec, comp_data, uncompressed_size, out=None):
+    """Dekomprimiert einen XISF-Datenblock. Mit out (und cramjam) direkt in diesen Puffer, sonst als bytes."""
+    if out is not None and cramjam is not None:
+        if codec in ("lz4", "lz4hc"):
+            cramjam.lz4.decompress_block_into(comp_data, out)
+            return out
+        if codec == "zstd":
+            cramjam.zstd.decompress_into(comp_data, out)
+            return out
+        if codec == "zlib":
+            cramjam.zlib.decompress_into(comp_data, out)
+            return out
+    if codec in ("lz4", "lz4hc"): # lz4hc unterscheidet sich nur beim Komprimieren
+        return lz4.block.decompress(comp_data, uncompressed_size=uncompressed_size)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("ZSTD-komprimierte XISF-Datei: bitte 'zstandard' oder 'cramjam' installieren.")
+        return zstandard.ZstdDecompressor().decompress(comp_data, max_output_size=uncompressed_size)
+    if codec == "zlib":
+        return zlib.decompress(comp_data)
+    raise ValueError(f"Nicht unterstützte XISF-Kompression: {codec}")
+
+if numba is not None:
+    @numba.njit(nogil=True, cache=True)
+    def _unshuffle_uint16_kernel(src, out):
+        # src: n Low-Bytes gefolgt von n High-Bytes; nogil, damit Worker-Threads parallel laufen
+        n = out.size
+        for i in range(n):
+            out[i] = src[i] | (np.uint16(src[n + i]) << 8)
+
+    @numba.njit(parallel=True, cache=True)
+    def _apply_lut_kernel(img, lut, out):
+        # Ein Durchlauf über das Bild, Zeilen auf alle Kerne verteilt
+        for i in numba.prange(img.shape[0]):
+            for j in range(img.shape[1]):
+                out[i, j] = lut[img[i, j]]
+
+    @numba.njit(nogil=True, cache=True)
+    def _int_min_max_kernel(flat):
+        # Min und Max in einem einzigen (vektorisierten) Durchlauf statt min() + max()
+        mn = flat[0]
+        mx = flat[0]
+        for i in range(flat.size):
+            mn = min(mn, flat[i])
+            mx = max(mx, flat[i])
+        return mn, mx
+
+    @numba.njit(nogil=True, cache=True)
+    def _quantize_kernel(flat, img_min, scale, out):
+        for i in range(flat.size):
+            v = (flat[i] - img_min) * scale
+            out[i] = 0 if v != v else np.uint16(np.rint(v)) # NaN-Pixel werden schwarz
+
+def nan_min_max(arr):
+    """(min, max) ohne NaN; Ganzzahl-Bilder mit numba in einem Durchlauf, sonst per nanmin/nanmax."""
+    if numba is not None and arr.size and arr.dtype.kind in "ui":
+        return _int_min_max_kernel(arr.ravel())
+    # Für float sind nanmin/nanmax (SIMD) schneller als ein NaN-prüfender Skalar-Kernel
+    return np.nanmin(arr), np.nanmax(arr)
+
+def quantize_to_uint16(image_data):
+    """Normalisiert float-Bilddaten (z.B. FITS) auf 0-65535 und liefert (uint16-Array, min, max) wie bei XISF."""
+    img_min, img_max = nan_min_max(image_data)
+    if not img_max > img_min:
+        return np.zeros(image_data.shape, dtype=np.uint16), 0, 0
+    scale = np.float32(65535 / (img_max - img_min))
+    if numba is not None:
+        # Normalisieren, Runden und nach uint16 wandeln in einem einzigen Durchlauf
+        out = np.empty(image_data.shape, dtype=np.uint16)
+        _quantize_kernel(image_data.ravel(), image_data.dtype.type(img_min), scale, out.reshape(-1))
+        return out, 0, 65535
+    scaled = (image_data - img_min) * scale
+    np.nan_to_num(scaled, copy=False, nan=0.0) # NaN-Pixel werden schwarz
+    return np.rint(scaled, out=scaled).astype(np.uint16), 0, 65535
+
+def apply_tone_lut(img_u16, lut, out=None):
+    """Bildet ein uint16-Bild über die Ton-LUT auf uint8 ab (mit numba parallel, sonst per np.take).
+    out: optional wiederverwendeter uint8-Puffer gleicher Form."""
+    if out is None or out.shape != img_u16.shape:
+        out = np.empty(img_u16.shape, dtype=np.uint8)
+    if numba is not None and img_u16.ndim == 2:
+        _apply_lut_kernel(img_u16, lut, out)
+    else:
+        np.take(lut, img_u16, out=out)
+    return out
+
+def unshuffle_uint16(data, item_size=2):
+    # XISF-Shuffling ist ein Byte-Shuffle (nicht Bit-Shuffle wie bitshuffle.bitunshuffle):
+    # erst alle 1. Bytes jedes Elements, dann alle 2. Bytes usw., Restbytes unverändert am Ende.
+    # Rücktransposition als eine einzige strided Kopie direkt in das uint16-Ergebnis (kein tobytes).
     arr = np.frombuffer(data, dtype=np.uint8)
-    n = arr.size // 2
-    low = arr[:n].astype(np.uint16)
-    high = arr[n:2*n].astype(np.uint16)
-    combined = low + (high << 8)
-    return combined.tobytes()
+    out = np.empty(arr.size // 2, dtype=np.uint16)
+    if numba is not None and item_size == 2:
+        _unshuffle_uint16_kernel(arr, out)
+        return out
+    out_bytes = out.view(np.uint8)
+    n = out_bytes.size // item_size
+    body = n * item_size
+    out_bytes[:body].reshape(n, item_size)[...] = arr[:body].reshape(item_size, n).T
+    out_bytes[body:] = arr[body:out_bytes.size]
+    return out
+
+_decomp_local = threading.local() # Dekompressionspuffer pro Thread (wächst auf größten Frame)
+
+def _get_decomp_buf(size):
+    """Liefert einen wiederverwendeten Puffer der Größe size für den aufrufenden Thread."""
+    buf = getattr(_decomp_local, "buf", None)
+    if buf is None or len(buf) < size:
+        buf = bytearray(size)
+        _decomp_local.buf = buf
+    return memoryview(buf)[:size]
+
+def read_xisf_pixels(mm, header):
+    """Liest den Pixelblock einer gemappten XISF-Datei als eigenständiges uint16-Array (height, width)."""
+    start = header["offset"]
+    end = start + header["compressed_size"]
+    if header["compression"] != "none":
+        uncompressed_size = header["uncompressed_size"]
+        shuffled = "+sh:" in header["compression"]
+        # Views müssen vor dem Schließen der mmap freigegeben sein
+        with memoryview(mm) as mm_view, mm_view[start:end] as comp_data:
+            if cramjam is None:
+                target = None
+            elif shuffled:
+                # In wiederverwendeten Puffer dekomprimieren, das Unshuffle erzeugt ohnehin eine Kopie
+                target = _get_decomp_buf(uncompressed_size)
+            else:
+                # Ohne Shuffle direkt in das Ergebnis-Array dekomprimieren
+                target = np.empty(uncompressed_size, dtype=np.uint8)
+            decompressed = decompress_xisf_block(header["codec"], comp_data, uncompressed_size, target)
+        if shuffled:
+            image_arr = unshuffle_uint16(decompressed, header["item_size"])
+        else:
+            image_arr = np.frombuffer(decompressed, dtype=np.uint16)
+    else:
+        image_arr = np.frombuffer(mm[start:end], dtype=np.uint16)
+    pixel_count = header["width"] * header["height"]
+    return image_arr[:pixel_count].reshape((header["height"], header["width"])) # Bleibt uint16
+
+def read_raw_image_data(file_path):
+    """Lädt die rohen Bilddaten (XISF als uint16, FITS als float32) für Vorschau und Prefetch."""
+    if file_path.lower().endswith((".xisf", ".xifs")):
+        # mmap statt f.read(): Header-Suche und Payload-Slice ohne Kopie der ganzen Datei
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            st = os.fstat(f.fileno())
+            return read_xisf_pixels(mm, _cached_parse_xisf_header(file_path, st.st_mtime_ns, st.st_size))
+    elif file_path.lower().endswith(".fits"):
+        with fits.open(file_path) as hdulist:
+            for hdu in hdulist:
+                if hdu.data is not None:
+                    return np.array(hdu.data, dtype=np.float32)
+        raise ValueError("No image data found in FITS file.")
+    else:
+        raise ValueError(f"Unsupported file type for preview: {file_path}")
+
+def render_preview(file_path, max_width):
+    """Erzeugt die Vorschau einer Datei; liefert (os.stat-Ergebnis, PIL-Bild) oder None bei ungültiger Bildgröße.
+    Modulebene, damit sie in den Prozessen des Vorschau-Pools laufen kann."""
+    st = os.stat(file_path) # Vor dem Lesen, damit eine spätere Änderung die Vorschau ungültig macht
+    image_arr = read_raw_image_data(file_path)
+    if image_arr.ndim != 2 or image_arr.shape[0] == 0 or image_arr.shape[1] == 0: return None # Ungültige Bildgröße
+    original_height, original_width = image_arr.shape
+
+    # Zuerst auf ungefähr Vorschaugröße verkleinern, damit Stretch & Co. nur auf wenigen Pixeln laufen
+    image_arr = block_sum(image_arr, max(1, original_width // max_width))
+    
+    # Normalisieren (0-1)
+    img_min, img_max = nan_min_max(image_arr) # NaN-fest für FITS
+    # Ein float32-Arbeitspuffer für Normalisierung, Stretch und Gamma (ohne Zwischen-Arrays)
+    img_norm_preview = np.empty(image_arr.shape, dtype=np.float32)
+    if img_max > img_min:
+        np.subtract(image_arr, img_min, out=img_norm_preview, casting="unsafe")
+        np.multiply(img_norm_preview, 1.0 / (img_max - img_min), out=img_norm_preview)
+    else:
+        img_norm_preview.fill(0)
+
+    # Einfacher Stretch für die Vorschau (damit sie nicht zu dunkel ist)
+    # Moderater asinh Stretch und Gamma-Anpassung
+    stretched_preview = asinh_stretch(img_norm_preview, 50, out=img_norm_preview) # Kleinerer Stretch-Faktor für Preview
+    np.power(stretched_preview, 1 / 1.2, out=stretched_preview) # Weniger aggressives Gamma
+    
+    np.clip(stretched_preview, 0, 1, out=stretched_preview)
+    np.multiply(stretched_preview, 255, out=stretched_preview)
+    img_8bit_preview = stretched_preview.astype(np.uint8)
+    pil_preview_full = Image.fromarray(img_8bit_preview, mode='L') # 'L' für Graustufen
+
+    # Auf exakte Vorschaugröße bringen unter Beibehaltung des Seitenverhältnisses
+    aspect_ratio = original_height / original_width
+    preview_width = max_width
+    preview_height = int(preview_width * aspect_ratio)
+    if preview_height == 0 : preview_height = 1 # Mindesthöhe
+
+    # Nach block_sum bleibt nur ein kleiner Restfaktor; LANCZOS wäre hier unnötig teuer
+    resample = Image.Resampling.BOX if pil_preview_full.width > 4 * preview_width else Image.Resampling.BILINEAR
+    return st, pil_preview_full.resize((preview_width, preview_height), resample)
+
+class BytesLRU(OrderedDict):
+    """LRU-Cache für (uint16-Array, min, max)-Einträge, begrenzt durch die Summe der Array-Bytes."""
+
+    def __init__(self, maxbytes):
+        super().__init__()
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.nbytes -= self[key][0].nbytes
+        super().__setitem__(key, value)
+        self.nbytes += value[0].nbytes
+
+    def __delitem__(self, key):
+        self.nbytes -= self[key][0].nbytes
+        super().__delitem__(key)
+
+    def popitem(self, last=True):
+        key, value = super().popitem(last=last)
+        self.nbytes -= value[0].nbytes
+        return key, value
+
+    def clear(self):
+        super().clear()
+        self.nbytes = 0
+
+    def put(self, key, value):
+        """Fügt einen Eintrag als zuletzt benutzt ein und verdrängt die ältesten bis zum Budget."""
+        self[key] = value
+        self.move_to_end(key)
+        while self.nbytes > self.maxbytes and len(self) > 1: # Den neuen Eintrag immer behalten
+            self.popitem(last=False)
+
+    def get_and_touch(self, key):
+        """Liefert einen Eintrag und markiert ihn als zuletzt benutzt."""
+        value = self[key]
+        self.move_to_end(key)
+        return value
+
+    def rename(self, old_key, new_key):
+        """Überträgt einen Eintrag auf einen neuen Schlüssel, z.B. nach dem Verschieben der Datei."""
+        if old_key in self:
+            value = self[old_key]
+            del self[old_key] # pop() würde nbytes nicht nachführen
+            self[new_key] = value
 
 class XISFViewer(tk.Tk):
     PREVIEW_MAX_WIDTH = 400 # Maximale Breite der generierten Vorschauen
+    PREVIEW_DISK_DIR = os.path.join(os.path.expanduser("~"), ".cache", "xifs-viewer") # Auf Platte gespeicherte Vorschauen
+    PREFETCH_MAX_IN_FLIGHT = 4 # Maximal gleichzeitig laufende Vorab-Ladevorgänge
+    IMAGE_CACHE_MAX_BYTES = 1 << 30 # Speicherbudget des Bild-Caches (1 GiB)
+    TONE_LUT_CACHE_SIZE = 16 # Anzahl gemerkter Ton-LUTs (je 64 KB)
 
     def __init__(self):
         super().__init__()
@@ -109,18 +654,42 @@ class XISFViewer(tk.Tk):
         self.last_folder = os.path.join(os.path.expanduser("~"), "Desktop")
         self.active_files = []
         self.pretrash_files = []
+        self._file_sizes = {} # file_path -> Größe in Bytes aus dem Ordner-Scan
+        self._fits_hdr_cache = {} # file_path -> (mtime_ns, Header-Infos) für den Header-Editor
+        self._header_apply_running = False # Header-Änderungen werden gerade im Hintergrund geschrieben
+        self._header_apply_executor = None # Pool der laufenden Header-Änderung, zum Abbrechen ausstehender Dateien
+        self._preview_win = None # Wiederverwendetes Vorschaufenster des Header-Editors
+        self._preview_text = None
+        self._preview_controls = None # Knopfleiste des aktuellen Vorschau-Durchlaufs
+        self._preview_confirm_btn = None # "Confirm"-Knopf darin, während des Schreibens gesperrt
+        self._preview_closed = tk.BooleanVar(self, value=True)
         self.current_file = None
         self.current_index = None
-        self.original_img_norm = None
+        self.original_img_u16 = None # Bilddaten als uint16 (FITS quantisiert), Anzeige über Tonwert-LUT
+        self.original_img_range = None # (min, max) der uint16-Daten für die Normalisierung in der LUT
         self.xml_header = None
         self.use_aligned = True  
-        self.cache = OrderedDict()
+        self.cache = BytesLRU(self.IMAGE_CACHE_MAX_BYTES)
         self.last_transform_params = None
         self.cached_transformed = None
+        self._display_u8 = None # Wiederverwendeter uint8-Ausgabepuffer der LUT-Anwendung
+        self._tk_image_key = None # (Modus, Größe) des angezeigten PhotoImage, für paste statt Neuanlage
+        self._label_size = None # (Breite, Höhe) des Bild-Labels aus dem letzten Configure-Event
+        self._resize_geometry = None # ((Label-Größe, Bildgröße), Zielgröße) der letzten Skalierung
+        self._display_buf = None # Wiederverwendeter Zielpuffer für cv2.resize
+        self._tone_luts = OrderedDict() # Zuletzt benutzte Ton-LUTs, Schlüssel: Slider-Werte + (min, max)
+        self._tone_base_key = None # Stretch/Gamma-Zwischenstand der LUT (float32), siehe _build_tone_lut
+        self._tone_base = None
         
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2) # Lädt Nachbardateien vorab in den Cache
+        self._prefetch_futures = {} # file_path -> Future der laufenden Vorab-Ladevorgänge
+
         self.preview_cache = {}  # Cache für reduzierte Vorschauen
         self.displaying_preview = False # Flag ob gerade eine Vorschau angezeigt wird
         self.preview_generation_in_progress = False # Flag für laufende Preview-Generierung
+        self._preview_executor = None # Pool der Preview-Generierung, über Ordnerwechsel wiederverwendet; beim Schließen abgebrochen
+        self._closing = False # Fenster wird geschlossen: Hintergrundarbeit nicht mehr fortsetzen
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # ----- TOP FRAME -----
         top_frame = tk.Frame(self, bg="black")
@@ -233,7 +802,7 @@ class XISFViewer(tk.Tk):
         
         self.image_label = tk.Label(self.left_top_frame, bg="black", fg="red", font=("Arial", 14))
         self.image_label.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
-        self.image_label.bind("<Configure>", lambda e: self.update_display_image())
+        self.image_label.bind("<Configure>", self._on_image_label_configure)
         
         self.left_bottom_frame = tk.Frame(self.image_paned, bg="black")
         self.image_paned.add(self.left_bottom_frame, stretch="never")
@@ -247,6 +816,13 @@ class XISFViewer(tk.Tk):
                                  borderwidth=1, relief="ridge")
         self.fits_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=2, pady=2)
         self.fits_text.tag_configure("white", foreground="white")
+        # Klickbare Überschrift: XISF-Properties werden erst bei Bedarf eingefügt
+        self.fits_text.tag_configure("expand_props", underline=True)
+        self.fits_text.tag_bind("expand_props", "<Button-1>", self._expand_xisf_properties)
+        self.fits_text.tag_bind("expand_props", "<Enter>", lambda e: self.fits_text.config(cursor="hand2"))
+        self.fits_text.tag_bind("expand_props", "<Leave>", lambda e: self.fits_text.config(cursor=""))
+        self._pending_xisf_properties = None # Noch nicht eingefügte Property-Elemente der aktuellen Datei
+        self._props_expanded_file = None # Datei, deren Properties aufgeklappt wurden; bleibt beim Neuaufbau des Headers offen
         fits_scrollbar = tk.Scrollbar(self.left_bottom_frame, command=self.fits_text.yview, bg="black")
         fits_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.fits_text.config(yscrollcommand=fits_scrollbar.set, state=tk.DISABLED)
@@ -306,6 +882,24 @@ class XISFViewer(tk.Tk):
         self.displaying_preview = False # Deaktiviere den Preview-Modus
         self.update_display_image()
 
+    def _on_image_label_configure(self, event):
+        """Merkt sich die Label-Größe; neu zeichnen nur, wenn sie sich wirklich geändert hat."""
+        size = (event.width, event.height)
+        if size == self._label_size:
+            return
+        self._label_size = size
+        self.update_display_image()
+
+    def _display_target_size(self):
+        """Verfügbare Fläche für das Bild, bevorzugt aus dem Configure-Event (keine Tcl-Abfrage)."""
+        if self._label_size is not None and self._label_size[0] >= 10 and self._label_size[1] >= 10:
+            return self._label_size
+        # Label noch nicht gezeichnet: Fallback auf eine vernünftige Größe
+        # Wir nehmen an, das Bild-Label nimmt ca. die Hälfte der Fensterbreite und 1/3 der Höhe ein.
+        parent_width = self.left_top_frame.winfo_width() if self.left_top_frame.winfo_width() > 10 else self.winfo_width() // 2
+        parent_height = self.left_top_frame.winfo_height() if self.left_top_frame.winfo_height() > 10 else self.winfo_height() // 1.5
+        return max(10, parent_width - 10), max(10, parent_height - 80) # Puffer für Slider
+
     def set_sash_position(self):
         try:
             self.update_idletasks()
@@ -332,23 +926,18 @@ class XISFViewer(tk.Tk):
         self.preview_cache.clear()
         self.displaying_preview = False
         self.cache.clear() # Auch den Haupt-LRU-Cache leeren
-        self.original_img_norm = None
-        self.cached_transformed = None
-        self.last_transform_params = None
+        self._cancel_prefetch()
+        self._set_current_image(None)
 
-        files_main = glob.glob(os.path.join(folder, "*.xisf")) + \
-                     glob.glob(os.path.join(folder, "*.xifs")) + \
-                     glob.glob(os.path.join(folder, "*.fits"))
-        files_main = sorted(files_main, key=lambda s: s.lower())
+        # Ein scandir-Durchlauf pro Ordner liefert Pfade und Größen (statt dreifachem glob + getsize pro Datei)
+        entries_main = scan_image_files(folder)
         pretrash_dir = os.path.join(folder, "PRETRASH")
-        files_pretrash = []
+        entries_pretrash = []
         if os.path.isdir(pretrash_dir):
-            files_pretrash = glob.glob(os.path.join(pretrash_dir, "*.xisf")) + \
-                             glob.glob(os.path.join(pretrash_dir, "*.xifs")) + \
-                             glob.glob(os.path.join(pretrash_dir, "*.fits"))
-            files_pretrash = sorted(files_pretrash, key=lambda s: s.lower())
-        self.active_files = files_main
-        self.pretrash_files = files_pretrash
+            entries_pretrash = scan_image_files(pretrash_dir)
+        self._file_sizes = dict(entries_main + entries_pretrash)
+        self.active_files = [path for path, _ in entries_main]
+        self.pretrash_files = [path for path, _ in entries_pretrash]
         self.update_file_lists()
         self.current_file = None
         self.image_label.configure(image=None)
@@ -356,6 +945,7 @@ class XISFViewer(tk.Tk):
         self.fits_text.delete("1.0", tk.END)
         self.fits_text.config(state=tk.DISABLED)
         self.status_label.config(text=f"{len(self.active_files)} files in {os.path.basename(folder)}")
+        self._load_disk_previews()
 
         # Automatically select and load the first file if available
         if self.active_files:
@@ -372,25 +962,38 @@ class XISFViewer(tk.Tk):
             self.current_index = None
 
 
-    def update_file_lists(self):
-        self.active_listbox.delete(0, tk.END)
-        for f in self.active_files:
+    def _file_size(self, file_path):
+        """Dateigröße aus dem Ordner-Scan; nur unbekannte Pfade werden einzeln abgefragt."""
+        size_bytes = self._file_sizes.get(file_path)
+        if size_bytes is None:
             try:
-                size_bytes = os.path.getsize(f)
-                size_mb = round(size_bytes / (1024 * 1024))
+                size_bytes = os.path.getsize(file_path)
+                self._file_sizes[file_path] = size_bytes
             except Exception:
-                size_mb = "?"
-            display = f"{os.path.basename(f)} ({size_mb} MB)"
-            self.active_listbox.insert(tk.END, display)
+                return None
+        return size_bytes
+
+    def _move_cached_file(self, old_path, new_path):
+        """Überträgt Größe, dekodiertes Bild und Vorschau einer verschobenen Datei auf ihren neuen Pfad.
+        Der Inhalt ändert sich durch das Verschieben nicht, also muss nichts neu gelesen werden."""
+        size_bytes = self._file_sizes.pop(old_path, None)
+        if size_bytes is not None:
+            self._file_sizes[new_path] = size_bytes
+        self.cache.rename(old_path, new_path)
+        if old_path in self.preview_cache:
+            self.preview_cache[new_path] = self.preview_cache.pop(old_path)
+
+    def _file_list_row(self, f):
+        size_bytes = self._file_size(f)
+        size_mb = round(size_bytes / (1024 * 1024)) if size_bytes is not None else "?"
+        return f"{os.path.basename(f)} ({size_mb} MB)"
+
+    def update_file_lists(self):
+        # Alle Zeilen in einem einzigen insert-Aufruf (ein Tcl-Befehl statt einer pro Datei)
+        self.active_listbox.delete(0, tk.END)
+        self.active_listbox.insert(tk.END, *[self._file_list_row(f) for f in self.active_files])
         self.pretrash_listbox.delete(0, tk.END)
-        for f in self.pretrash_files:
-            try:
-                size_bytes = os.path.getsize(f)
-                size_mb = round(size_bytes / (1024 * 1024))
-            except Exception:
-                size_mb = "?"
-            display = f"{os.path.basename(f)} ({size_mb} MB)"
-            self.pretrash_listbox.insert(tk.END, display)
+        self.pretrash_listbox.insert(tk.END, *[self._file_list_row(f) for f in self.pretrash_files])
         self.active_listbox.config(width=75)
         self.pretrash_listbox.config(width=75)
         # Selection logic moved to open_folder_dialog to ensure consistent state
@@ -417,6 +1020,7 @@ class XISFViewer(tk.Tk):
             self.current_index -= 1
             self.current_file = self.active_files[self.current_index]
             self._load_and_select_file(self.current_file, self.active_listbox, self.current_index)
+            self._schedule_prefetch()
         return "break"
 
     def navigate_down(self, event):
@@ -426,6 +1030,7 @@ class XISFViewer(tk.Tk):
             self.current_index += 1
             self.current_file = self.active_files[self.current_index]
             self._load_and_select_file(self.current_file, self.active_listbox, self.current_index)
+            self._schedule_prefetch()
         return "break"
 
     def skip_up(self, event):
@@ -442,15 +1047,16 @@ class XISFViewer(tk.Tk):
             self.displaying_preview = self.current_file in self.preview_cache
             # Nur FITS-Header aktualisieren, Bild aus Cache laden oder Preview anzeigen
             if not self.displaying_preview and self.current_file in self.cache:
-                 self.original_img_norm = self.cache[self.current_file]
+                 self._set_current_image(self.cache.get_and_touch(self.current_file))
             elif not self.displaying_preview: # Fallback: wenn nicht im Cache, doch laden
                 if self.current_file.lower().endswith(".fits"):
-                    self.load_fits_file(self.current_file) # lädt auch original_img_norm
+                    self.load_fits_file(self.current_file) # lädt auch original_img_u16
                 else:
                     self.load_xisf_file(self.current_file, use_alignment=True)
             
             self.update_fits_header() # Header immer aktualisieren
             self.update_display_image() # Bildanzeige aktualisieren (ggf. mit Preview)
+            self._schedule_prefetch()
         return "break"
 
     def skip_down(self, event):
@@ -466,7 +1072,7 @@ class XISFViewer(tk.Tk):
 
             self.displaying_preview = self.current_file in self.preview_cache
             if not self.displaying_preview and self.current_file in self.cache:
-                 self.original_img_norm = self.cache[self.current_file]
+                 self._set_current_image(self.cache.get_and_touch(self.current_file))
             elif not self.displaying_preview:
                 if self.current_file.lower().endswith(".fits"):
                     self.load_fits_file(self.current_file)
@@ -475,6 +1081,7 @@ class XISFViewer(tk.Tk):
 
             self.update_fits_header()
             self.update_display_image()
+            self._schedule_prefetch()
         return "break"
 
     def on_active_file_activate(self, event):
@@ -490,6 +1097,7 @@ class XISFViewer(tk.Tk):
                     self.load_fits_file(self.current_file)
                 else:
                     self.load_xisf_file(self.current_file, use_alignment=True)
+                self._schedule_prefetch()
 
 
     def on_pretrash_file_activate(self, event):
@@ -504,96 +1112,193 @@ class XISFViewer(tk.Tk):
             else:
                 self.load_xisf_file(self.current_file, use_alignment=True)
 
-    def _get_raw_image_data(self, file_path):
-        """Hilfsfunktion zum Laden der rohen Bilddaten für die Preview-Erstellung."""
-        if file_path.lower().endswith((".xisf", ".xifs")):
-            with open(file_path, "rb") as f:
-                file_bytes = f.read()
-            header = parse_xisf_header(file_bytes)
-            if header["compression"] != "none":
-                comp_data = file_bytes[header["offset"]: header["offset"] + header["compressed_size"]]
-                decompressed = lz4.block.decompress(comp_data, uncompressed_size=header["uncompressed_size"])
-                if "+sh:" in header["compression"]:
-                    decompressed = unshuffle_uint16(decompressed)
-                data = decompressed
-            else:
-                data = file_bytes[header["offset"]: header["offset"] + header["compressed_size"]]
-            image_arr = np.frombuffer(data, dtype=np.uint16).reshape((header["height"], header["width"]))
-            return image_arr.astype(np.float32) # Konvertiere zu float für Normalisierung
-        elif file_path.lower().endswith(".fits"):
-            with fits.open(file_path) as hdulist:
-                image_data = None
-                for hdu in hdulist:
-                    if hdu.data is not None:
-                        image_data = np.array(hdu.data, dtype=np.float32)
-                        break
-                if image_data is None:
-                    raise ValueError("No image data found in FITS file.")
-                return image_data
-        else:
-            raise ValueError(f"Unsupported file type for preview: {file_path}")
-
+    def _load_cache_entry(self, file_path):
+        """Lädt eine Datei als Cache-Eintrag (uint16-Array, min, max); läuft in den Prefetch-Threads."""
+        image_arr = read_raw_image_data(file_path)
+        if image_arr.dtype == np.uint16: # XISF
+            img_min, img_max = nan_min_max(image_arr)
+            return image_arr, int(img_min), int(img_max)
+        return quantize_to_uint16(image_arr) # FITS
 
-    def _create_single_preview(self, file_path):
-        """Erzeugt eine einzelne Vorschau und speichert sie im Cache."""
+    def _schedule_prefetch(self):
+        """Lädt die Nachbarn der aktuellen Datei im Hintergrund in den Cache, damit Navigieren nicht blockiert."""
+        if not self.active_files or self.current_index is None:
+            return
+        for idx in (self.current_index + 1, self.current_index - 1):
+            if len(self._prefetch_futures) >= self.PREFETCH_MAX_IN_FLIGHT:
+                break
+            if not 0 <= idx < len(self.active_files):
+                continue
+            file_path = self.active_files[idx]
+            if file_path in self.cache or file_path in self._prefetch_futures:
+                continue
+            future = self._prefetch_pool.submit(self._load_cache_entry, file_path)
+            self._prefetch_futures[file_path] = future
+            # Ergebnis im Tk-Thread in den Cache übernehmen
+            future.add_done_callback(lambda f, p=file_path: self.after(0, self._on_prefetch_done, p, f))
+
+    def _on_prefetch_done(self, file_path, future):
+        """Übernimmt ein vorab geladenes Bild in den Cache (im Tk-Thread)."""
+        if self._prefetch_futures.get(file_path) is not future: # Abgebrochen (z.B. Ordnerwechsel)
+            return
+        del self._prefetch_futures[file_path]
+        if future.cancelled() or future.exception() is not None:
+            return # Fehler zeigt das reguläre Laden an, falls die Datei geöffnet wird
+        if file_path in self.active_files and file_path not in self.cache:
+            self.cache.put(file_path, future.result())
+
+    def _cancel_prefetch(self):
+        """Bricht noch nicht gestartete Vorab-Ladevorgänge ab und verwirft laufende."""
+        for future in self._prefetch_futures.values():
+            future.cancel()
+        self._prefetch_futures.clear()
+
+    def _preview_disk_key(self, file_path):
+        """Hash des absoluten Pfads; Präfix aller gespeicherten Vorschauversionen dieser Datei."""
+        return hashlib.blake2b(os.path.abspath(file_path).encode("utf-8", "surrogateescape"), digest_size=16).hexdigest()
+
+    def _preview_disk_path(self, file_path, st=None):
+        """Pfad der gespeicherten Vorschau; Größe und mtime_ns im Namen machen veraltete Vorschauen ungültig."""
+        if st is None:
+            st = os.stat(file_path)
+        return os.path.join(self.PREVIEW_DISK_DIR, f"{self._preview_disk_key(file_path)}.{st.st_size}.{st.st_mtime_ns}.png")
+
+    def _load_disk_previews(self):
+        """Sucht gespeicherte Vorschauen der aktiven Dateien im Prefetch-Pool; der Tk-Thread übernimmt das Ergebnis."""
+        future = self._prefetch_pool.submit(self._read_disk_previews, list(self.active_files))
+        future.add_done_callback(lambda f: self.after(0, self._on_disk_previews_loaded, f))
+
+    def _read_disk_previews(self, files):
+        """Lädt gespeicherte Vorschauen, deren Größe und mtime noch passen, und löscht veraltete Versionen derselben Dateien."""
         try:
-            image_arr = self._get_raw_image_data(file_path)
-            
-            # Normalisieren (0-1)
-            img_min = np.nanmin(image_arr) # nanmin für FITS
-            img_max = np.nanmax(image_arr) # nanmax für FITS
-            if img_max > img_min:
-                img_norm_preview = (image_arr - img_min) / (img_max - img_min)
-            else:
-                img_norm_preview = np.zeros_like(image_arr, dtype=np.float32)
-
-            # Einfacher Stretch für die Vorschau (damit sie nicht zu dunkel ist)
-            # Moderater asinh Stretch und Gamma-Anpassung
-            stretched_preview = asinh_stretch(img_norm_preview, 50) # Kleinerer Stretch-Faktor für Preview
-            stretched_preview = np.power(stretched_preview, 1 / 1.2) # Weniger aggressives Gamma
-            
-            img_8bit_preview = (np.clip(stretched_preview, 0, 1) * 255).astype(np.uint8)
-            pil_preview_full = Image.fromarray(img_8bit_preview, mode='L') # 'L' für Graustufen
-
-            # Verkleinern unter Beibehaltung des Seitenverhältnisses
-            original_width, original_height = pil_preview_full.size
-            if original_width == 0 or original_height == 0 : return # Ungültige Bildgröße
+            names = os.listdir(self.PREVIEW_DISK_DIR) # Ein Verzeichnis-Listing statt einer Abfrage pro Datei
+        except OSError:
+            return {}
+        versions_by_key = defaultdict(list)
+        for name in names:
+            versions_by_key[name.split(".", 1)[0]].append(name)
+        previews = {}
+        for file_path in files:
+            versions = versions_by_key.get(self._preview_disk_key(file_path))
+            if not versions: # Nie gespeichert: kein stat nötig
+                continue
+            try:
+                wanted = os.path.basename(self._preview_disk_path(file_path))
+                for name in versions:
+                    if name != wanted: # Datei wurde seitdem geändert
+                        os.remove(os.path.join(self.PREVIEW_DISK_DIR, name))
+                if wanted in versions:
+                    preview = Image.open(os.path.join(self.PREVIEW_DISK_DIR, wanted))
+                    preview.load() # Liest die Daten und schließt die Datei
+                    previews[file_path] = preview
+            except Exception as e:
+                print(f"Error loading cached preview for {os.path.basename(file_path)}: {e}")
+        return previews
 
-            aspect_ratio = original_height / original_width
-            preview_width = self.PREVIEW_MAX_WIDTH
-            preview_height = int(preview_width * aspect_ratio)
-            if preview_height == 0 : preview_height = 1 # Mindesthöhe
+    def _on_disk_previews_loaded(self, future):
+        """Übernimmt die gespeicherten Vorschauen in den Preview-Cache (im Tk-Thread)."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        active = set(self.active_files) # Ordner kann inzwischen gewechselt haben
+        for file_path, preview in future.result().items():
+            if file_path in active:
+                self.preview_cache.setdefault(file_path, preview) # Frisch erzeugte Vorschauen nicht überschreiben
 
-            pil_preview_resized = pil_preview_full.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
-            
-            self.preview_cache[file_path] = pil_preview_resized
-            # print(f"Cached preview for: {os.path.basename(file_path)}") # Debug
-            return True
-        except Exception as e:
-            print(f"Error creating preview for {os.path.basename(file_path)}: {e}")
-            if file_path in self.preview_cache: # Entferne fehlerhafte Einträge
-                del self.preview_cache[file_path]
-            return False
+    def _save_disk_preview(self, file_path, st, preview):
+        """Speichert eine Vorschau als PNG und entfernt ältere Versionen derselben Datei."""
+        try:
+            cache_path = self._preview_disk_path(file_path, st)
+            os.makedirs(self.PREVIEW_DISK_DIR, exist_ok=True)
+            stale_pattern = os.path.join(glob.escape(self.PREVIEW_DISK_DIR), self._preview_disk_key(file_path) + ".*.png")
+            for stale_path in glob.glob(stale_pattern):
+                if stale_path != cache_path:
+                    os.remove(stale_path)
+            preview.save(cache_path, "PNG", compress_level=1) # Verlustfrei, schnelles Schreiben
+        except Exception as e: # z.B. nicht beschreibbares Home - Vorschau bleibt im Speicher
+            print(f"Error saving preview for {os.path.basename(file_path)}: {e}")
+
+    def _store_preview(self, file_path, st, preview):
+        """Übernimmt eine fertige Vorschau in den Speicher- und Platten-Cache."""
+        self.preview_cache[file_path] = preview
+        self._save_disk_preview(file_path, st, preview)
+
+    def _get_preview_executor(self):
+        """Liefert den Pool für die Preview-Generierung; er wird einmal angelegt und für jeden Ordner wiederverwendet."""
+        if self._preview_executor is None:
+            # Dateien sind unabhängig: in eigenen Prozessen rendern, damit kein GIL die Kerne ausbremst.
+            # "spawn" statt fork, da der Pool neben dem Tk-Hauptthread läuft. Prozesse startet der Pool erst bei Bedarf.
+            try:
+                self._preview_executor = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, NotImplementedError, ValueError): # Keine Prozesse möglich -> Threads
+                self._preview_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        return self._preview_executor
 
-    def _cache_previews_thread_target(self):
+    def _cache_previews_thread_target(self, executor):
         """Target function for the preview caching thread."""
         self.preview_generation_in_progress = True
-        self.status_label.config(text="Caching previews... (0%)")
-        self.update_idletasks()
-
-        cached_count = 0
-        total_files = len(self.active_files)
-        for i, file_path in enumerate(self.active_files):
-            if file_path not in self.preview_cache: # Nur cachen, wenn noch nicht vorhanden
-                if self._create_single_preview(file_path):
-                    cached_count +=1
-            else: # Bereits gecached, zähle mit
-                cached_count +=1
-
-            progress = int(( (i + 1) / total_files) * 100)
-            self.status_label.config(text=f"Caching previews... ({progress}%)")
-            self.update_idletasks() # Wichtig, um UI-Updates im Thread zu sehen
+        self.after(0, self.status_label.config, {"text": "Caching previews... (0%)"})
+
+        files = list(self.active_files) # Snapshot, die Liste kann sich während des Cachings ändern
+        total_files = len(files)
+        pending_files = [f for f in files if f not in self.preview_cache] # Nur cachen, wenn noch nicht vorhanden
+        cached_count = total_files - len(pending_files) # Bereits gecachte mitzählen
+        done_count = cached_count
+        last_ui_update = time.monotonic()
 
+        try:
+            futures = {executor.submit(render_preview, f, self.PREVIEW_MAX_WIDTH): f for f in pending_files}
+        except BrokenExecutor as e: # Ein Worker ist bei einem früheren Ordner abgestürzt
+            print(f"Preview pool unusable: {e}")
+            self.after(0, self._discard_preview_executor, executor)
+            self.after(0, self._on_preview_caching_complete, cached_count, total_files)
+            return
+        except RuntimeError: # Pool wurde beim Schließen des Fensters beendet
+            return
+        pool_broken = False
+        for future in as_completed(futures):
+            if self._closing: # Ausstehende Vorschauen hat on_close bereits verworfen
+                return
+            file_path = futures[future]
+            try:
+                result = future.result()
+            except BrokenExecutor as e: # Worker-Prozess abgestürzt, alle ausstehenden Vorschauen sind verloren
+                print(f"Error creating preview for {os.path.basename(file_path)}: {e}")
+                pool_broken = True
+                result = None
+            except Exception as e:
+                print(f"Error creating preview for {os.path.basename(file_path)}: {e}")
+                result = None
+            if result is not None:
+                self._store_preview(file_path, *result)
+                cached_count += 1
+            done_count += 1
+            now = time.monotonic()
+            if now - last_ui_update >= 0.1: # Statuszeile höchstens ~10x pro Sekunde aktualisieren
+                last_ui_update = now
+                progress = int((done_count / total_files) * 100)
+                self.after(0, self.status_label.config, {"text": f"Caching previews... ({progress}%)"})
+
+        if pool_broken:
+            self.after(0, self._discard_preview_executor, executor)
+        self.after(0, self._on_preview_caching_complete, cached_count, total_files)
+
+    def _discard_preview_executor(self, executor):
+        """Verwirft einen defekten Preview-Pool; _get_preview_executor legt beim nächsten Mal einen neuen an."""
+        executor.shutdown(wait=False)
+        if self._preview_executor is executor:
+            self._preview_executor = None
+
+    def on_close(self):
+        """Schließt das Fenster, ohne auf ausstehende Vorschauen oder Vorab-Ladevorgänge zu warten."""
+        self._closing = True
+        if self._preview_executor is not None:
+            self._preview_executor.shutdown(wait=False, cancel_futures=True) # Noch nicht gestartete verwerfen
+        self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._cancel_header_apply() # Begonnene Header-Änderungen schreiben die Worker noch zu Ende
+        self.destroy()
+
+    def _on_preview_caching_complete(self, cached_count, total_files):
+        """Läuft im Tk-Thread, sobald alle Vorschauen erzeugt wurden."""
         self.status_label.config(text=f"Preview caching complete. {cached_count}/{total_files} previews available.")
         self.preview_generation_in_progress = False
         
@@ -614,22 +1319,68 @@ class XISFViewer(tk.Tk):
             return
 
         # Start caching in a separate thread to keep UI responsive
-        threading.Thread(target=self._cache_previews_thread_target, daemon=True).start()
+        threading.Thread(target=self._cache_previews_thread_target, args=(self._get_preview_executor(),), daemon=True).start()
+
 
+    def _set_current_image(self, cache_entry):
+        """Setzt das aktuelle Bild aus einem Cache-Eintrag (uint16-Array, min, max) oder leert es bei None."""
+        if cache_entry is not None:
+            self.original_img_u16, img_min, img_max = cache_entry
+            self.original_img_range = (img_min, img_max)
+        else:
+            self.original_img_u16 = None
+            self.original_img_range = None
+        self.cached_transformed = None
+        self.last_transform_params = None
+
+    def _build_tone_lut(self, effective_stretch, gamma, brightness, contrast, img_min, img_max):
+        """Fasst Normalisierung, asinh-Stretch, Gamma, Helligkeit und Kontrast in einer uint16 -> uint8 LUT zusammen."""
+        key = (effective_stretch, gamma, brightness, contrast, img_min, img_max)
+        lut = self._tone_luts.get(key)
+        if lut is not None: # Beim Blättern zwischen Bildern oder Zurückstellen eines Sliders ohne Neuberechnung
+            self._tone_luts.move_to_end(key)
+            return lut
+        # Teure Stufe (Normalisierung, asinh, Gamma) nur neu, wenn sich Stretch, Gamma oder Bild-Bereich ändern;
+        # Helligkeit und Kontrast setzen als zwei lineare Schritte auf dem gemerkten Zwischenstand auf
+        base_key = (effective_stretch, gamma, img_min, img_max)
+        if base_key != self._tone_base_key:
+            base = np.arange(65536, dtype=np.float32)
+            if img_max > img_min:
+                np.subtract(base, img_min, out=base)
+                np.true_divide(base, img_max - img_min, out=base)
+                np.clip(base, 0, 1, out=base)
+            else:
+                base.fill(0)
+            asinh_stretch(base, effective_stretch, out=base)
+            inv_gamma = 1/gamma if gamma != 0 else 1 # Div by zero guard
+            if inv_gamma != 1: # Gamma 1 ist die Identität, pow über 65536 Einträge sparen
+                np.power(base, inv_gamma, out=base)
+            self._tone_base = base
+            self._tone_base_key = base_key
+        # Restliche Stufen in-place auf einem einzigen float32-Puffer
+        x = np.multiply(self._tone_base, brightness)
+        np.clip(x, 0, 1, out=x)
+        np.subtract(x, 0.5, out=x)
+        np.multiply(x, contrast, out=x)
+        np.add(x, 0.5, out=x)
+        np.clip(x, 0, 1, out=x)
+        np.multiply(x, 255, out=x)
+        lut = x.astype(np.uint8)
+        self._tone_luts[key] = lut
+        if len(self._tone_luts) > self.TONE_LUT_CACHE_SIZE:
+            self._tone_luts.popitem(last=False)
+        return lut
 
     def load_xisf_file(self, file_path, use_alignment=False):
         # self.displaying_preview wird bereits in der aufrufenden Funktion gesetzt
         # basierend auf self.preview_cache. Hier nur Logik für volles Laden.
         
         if file_path in self.cache: # Aus Haupt-Cache laden
-            self.original_img_norm = self.cache[file_path]
-            self.cached_transformed = None
-            self.last_transform_params = None
+            self._set_current_image(self.cache.get_and_touch(file_path))
             # XML Header muss trotzdem geladen werden, falls noch nicht geschehen oder anders
             try:
-                with open(file_path, "rb") as f_header:
-                    file_bytes_header = f_header.read(4096) # Nur Anfang für Header lesen
-                header_info = parse_xisf_header(file_bytes_header)
+                st = os.stat(file_path)
+                header_info = _cached_parse_xisf_header(file_path, st.st_mtime_ns, st.st_size, need_xml_text=True)
                 self.xml_header = header_info["xml_header"]
             except Exception as e:
                 self.xml_header = f"Error reading XISF XML header: {e}"
@@ -637,41 +1388,24 @@ class XISFViewer(tk.Tk):
             return
 
         try:
-            with open(file_path, "rb") as f:
-                file_bytes = f.read()
-            header = parse_xisf_header(file_bytes)
+            # mmap statt f.read(): nur Header und Datenblock werden eingelesen, keine Kopie der ganzen Datei
+            with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header = parse_xisf_header(mm, need_xml_text=True)
+                # Gleicher Dekodierpfad wie Vorschau/Prefetch: Dekompression direkt in vorab angelegte Arrays
+                image_arr = read_xisf_pixels(mm, header)
             self.xml_header = header["xml_header"]
             
-            if header["compression"] != "none":
-                comp_data = file_bytes[header["offset"]: header["offset"] + header["compressed_size"]]
-                decompressed = lz4.block.decompress(comp_data, uncompressed_size=header["uncompressed_size"])
-                if "+sh:" in header["compression"]:
-                    decompressed = unshuffle_uint16(decompressed)
-                data = decompressed
-            else:
-                data = file_bytes[header["offset"]: header["offset"] + header["compressed_size"]]
-            
-            image_arr = np.frombuffer(data, dtype=np.uint16).reshape((header["height"], header["width"]))
-            
-            img_min = image_arr.min()
-            img_max = image_arr.max()
-            if img_max > img_min:
-                img_norm = (image_arr.astype(np.float32) - img_min) / (img_max - img_min)
-            else:
-                img_norm = np.zeros_like(image_arr, dtype=np.float32)
-            
-            self.original_img_norm = img_norm
-            self.cached_transformed = None
-            self.last_transform_params = None
+            # Rohdaten bleiben uint16, die Normalisierung steckt in der Tonwert-LUT
+            img_min, img_max = nan_min_max(image_arr) # Ein Durchlauf statt min() + max()
+            cache_entry = (image_arr, int(img_min), int(img_max))
+            self._set_current_image(cache_entry)
             
-            self.cache[file_path] = img_norm
-            if len(self.cache) > 5: # LRU Cache-Größe
-                self.cache.popitem(last=False)
+            self.cache.put(file_path, cache_entry)
             
             self.update_display_image()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open XISF file:\n{e}")
-            self.original_img_norm = None # Fehlerfall
+            self._set_current_image(None) # Fehlerfall
             self.image_label.configure(image=None) # Bild leeren
             self.image_label.image = None
 
@@ -680,9 +1414,7 @@ class XISFViewer(tk.Tk):
         # self.displaying_preview wird bereits in der aufrufenden Funktion gesetzt.
         
         if file_path in self.cache: # Aus Haupt-Cache laden
-            self.original_img_norm = self.cache[file_path]
-            self.cached_transformed = None
-            self.last_transform_params = None
+            self._set_current_image(self.cache.get_and_touch(file_path))
             self.update_display_image()
             return
 
@@ -698,27 +1430,60 @@ class XISFViewer(tk.Tk):
                 messagebox.showerror("Error", "No image data found in this FITS file.")
                 return
             
-            img_min = np.nanmin(image_data)
-            img_max = np.nanmax(image_data)
-            if img_max > img_min:
-                img_norm = (image_data - img_min) / (img_max - img_min)
-            else:
-                img_norm = np.zeros_like(image_data, dtype=np.float32)
-            
-            self.original_img_norm = img_norm
-            self.cached_transformed = None
-            self.last_transform_params = None
-            self.cache[file_path] = img_norm
-            if len(self.cache) > 5: # LRU Cache-Größe
-                self.cache.popitem(last=False)
+            cache_entry = quantize_to_uint16(image_data) # Halber Speicher gegenüber float32
+            self._set_current_image(cache_entry)
+            self.cache.put(file_path, cache_entry)
             
             self.update_display_image()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open FITS file:\n{e}")
-            self.original_img_norm = None
+            self._set_current_image(None)
             self.image_label.configure(image=None)
             self.image_label.image = None
 
+    def _fill_header_text(self, lines, white_lines):
+        """Ersetzt den Header-Text mit einem einzigen insert und markiert alle hervorgehobenen Zeilen in einem tag_add."""
+        self.fits_text.config(state=tk.NORMAL)
+        self.fits_text.delete("1.0", tk.END)
+        self.fits_text.insert(tk.END, "".join(lines))
+        self._tag_white_lines(white_lines)
+        self.fits_text.config(state=tk.DISABLED)
+
+    def _tag_white_lines(self, white_lines):
+        """Markiert alle angegebenen Zeilen mit einem einzigen tag_add."""
+        if white_lines:
+            ranges = []
+            for line_no in white_lines:
+                ranges += (f"{line_no}.0", f"{line_no}.end")
+            self.fits_text.tag_add("white", *ranges)
+
+    def _xisf_property_line(self, prop):
+        prop_id = prop.get("id", "")
+        prop_value = prop.get("value", "")
+        prop_type = prop.get("type", "") # Könnte nützlich sein
+        return f"{prop_id} = {prop_value} [Type: {prop_type}]\n"
+
+    def _expand_xisf_properties(self, event=None):
+        """Ersetzt die klickbare Properties-Überschrift durch die vollständige Liste."""
+        properties = self._pending_xisf_properties
+        title_range = self.fits_text.tag_ranges("expand_props")
+        if not properties or not title_range:
+            return
+        self._pending_xisf_properties = None
+        self._props_expanded_file = self.current_file
+        title_line = int(str(title_range[0]).split(".")[0])
+        lines = ["--- XISF Properties ---\n"]
+        white_lines = []
+        for prop in properties:
+            lines.append(self._xisf_property_line(prop))
+            if prop.get("id", "") in WHITE_HEADERS_XISF:
+                white_lines.append(title_line + len(lines) - 1)
+        self.fits_text.config(state=tk.NORMAL)
+        self.fits_text.delete(f"{title_line}.0", tk.END)
+        self.fits_text.insert(tk.END, "".join(lines))
+        self._tag_white_lines(white_lines)
+        self.fits_text.config(state=tk.DISABLED, cursor="")
+
     def update_fits_header(self):
         if not self.current_file:
             self.fits_text.config(state=tk.NORMAL)
@@ -727,68 +1492,53 @@ class XISFViewer(tk.Tk):
             return
         try:
             if self.current_file.lower().endswith(".fits"):
-                with fits.open(self.current_file) as hdulist:
-                    header = hdulist[0].header # Nur primärer Header
-                    white_headers = {"IMAGETYP", "EXPOSURE", "GAIN", "OFFSET", "CAMERAID", "FILTER", "DATE-OBS", "CCD-TEMP", "RA", "DEC", "OBJECT"}
-                    self.fits_text.config(state=tk.NORMAL)
-                    self.fits_text.delete("1.0", tk.END)
-                    for idx, key in enumerate(header):
-                        # Versuche Kommentar zu bekommen, falls vorhanden
-                        comment = f" / {header.comments[key]}" if header.comments[key] else ""
-                        header_str = f"{key} = {header[key]}{comment}\n"
-                        self.fits_text.insert(tk.END, header_str)
-                        if key in white_headers:
-                            start_idx = f"{idx + 1}.0"
-                            end_idx = f"{idx + 1}.end"
-                            self.fits_text.tag_add("white", start_idx, end_idx)
-                    self.fits_text.config(state=tk.DISABLED)
+                lines = []
+                white_lines = []
+                for idx, (key, value, comment) in enumerate(read_fits_header_cards(self.current_file)):
+                    # Kommentar nur anhängen, falls vorhanden
+                    comment = f" / {comment}" if comment else ""
+                    lines.append(f"{key} = {value}{comment}\n")
+                    if key in WHITE_HEADERS_FITS:
+                        white_lines.append(idx + 1)
+                self._fill_header_text(lines, white_lines)
             elif self.current_file.lower().endswith((".xisf", ".xifs")): # XISF
                 if self.xml_header: # Verwende den bereits geladenen XML-Header
-                    root = ET.fromstring(self.xml_header)
-                    # ns = {"nis": "http://www.pixinsight.com/xisf"} # 'nis' ist üblicher, aber Namespace wird direkt verwendet
-                    fits_keywords_xpath = ".//{http://www.pixinsight.com/xisf}FITSKeyword"
-                    # Suche auch nach Property Elementen als Fallback für einige wichtige Werte
-                    property_xpath = ".//{http://www.pixinsight.com/xisf}Property"
-
-                    fits_keywords = root.findall(fits_keywords_xpath)
-                    properties = root.findall(property_xpath)
+                    # FITSKeywords und (als Fallback für einige wichtige Werte) Property-Elemente
+                    _, fits_keywords, properties = parse_xisf_xml(self.xml_header)
 
-                    white_headers = {"IMAGETYP", "EXPOSURE", "GAIN", "OFFSET", "CAMERAID", "FILTER", "DATE-OBS", "CCD-TEMP", "RA", "DEC", "OBJECT", "Instrument:Camera:Gain", "Instrument:Camera:Offset", "Observation:Time:Start"}
-                    
-                    self.fits_text.config(state=tk.NORMAL)
-                    self.fits_text.delete("1.0", tk.END)
-                    
+                    lines = []
+                    white_lines = []
                     line_idx = 0
                     # Zuerst FITSKeywords
                     for kw in fits_keywords:
                         name = kw.get("name", "")
                         value = kw.get("value", "")
                         comment = kw.get("comment", "")
-                        line = f"{name} = {value} ({comment})\n"
-                        self.fits_text.insert(tk.END, line)
-                        if name in white_headers:
-                            start_idx = f"{line_idx + 1}.0"
-                            end_idx = f"{line_idx + 1}.end"
-                            self.fits_text.tag_add("white", start_idx, end_idx)
+                        lines.append(f"{name} = {value} ({comment})\n")
+                        if name in WHITE_HEADERS_XISF:
+                            white_lines.append(line_idx + 1)
                         line_idx += 1
                     
-                    # Dann Properties (optional, falls nicht schon als FITSKeyword vorhanden)
-                    # Hier könnte man eine Logik einbauen, um Duplikate zu vermeiden, aber für die Anzeige ist es oft ok.
-                    self.fits_text.insert(tk.END, "\n--- XISF Properties ---\n")
+                    # Dann Properties: oft Hunderte mit langen Werten, daher nur die hervorgehobenen sofort,
+                    # der Rest erst nach Klick auf die Überschrift (_expand_xisf_properties)
+                    if properties:
+                        lines.append(f"\n--- XISF Properties ({len(properties)}, click to expand) ---\n")
+                    else:
+                        lines.append("\n--- XISF Properties ---\n")
                     line_idx +=2
+                    props_title_line = line_idx
                     for prop in properties:
-                        prop_id = prop.get("id", "")
-                        prop_value = prop.get("value", "")
-                        prop_type = prop.get("type", "") # Könnte nützlich sein
-                        line = f"{prop_id} = {prop_value} [Type: {prop_type}]\n"
-                        self.fits_text.insert(tk.END, line)
-                        if prop_id in white_headers:
-                             start_idx = f"{line_idx + 1}.0"
-                             end_idx = f"{line_idx + 1}.end"
-                             self.fits_text.tag_add("white", start_idx, end_idx)
-                        line_idx += 1
-
-                    self.fits_text.config(state=tk.DISABLED)
+                        if prop.get("id", "") in WHITE_HEADERS_XISF:
+                            lines.append(self._xisf_property_line(prop))
+                            white_lines.append(line_idx + 1)
+                            line_idx += 1
+
+                    self._fill_header_text(lines, white_lines)
+                    self._pending_xisf_properties = properties or None
+                    if properties:
+                        self.fits_text.tag_add("expand_props", f"{props_title_line}.0", f"{props_title_line}.end")
+                        if self._props_expanded_file == self.current_file: # Vom Benutzer aufgeklappt, z.B. vor einer Slider-Änderung
+                            self._expand_xisf_properties()
                 else: # Fallback, falls xml_header nicht gesetzt ist (sollte nicht passieren bei geladenem Bild)
                     self.fits_text.config(state=tk.NORMAL)
                     self.fits_text.delete("1.0", tk.END)
@@ -811,12 +1561,13 @@ class XISFViewer(tk.Tk):
             self.update_fits_header()
 
         pil_image_to_display = None
+        array_to_display = None # uint8-Array des vollen Bildes, falls vorhanden (für cv2.resize)
 
         if self.displaying_preview and self.current_file and self.current_file in self.preview_cache:
             # Schnelle Vorschau anzeigen
             pil_image_to_display = self.preview_cache[self.current_file]
             # print(f"Displaying PREVIEW for {os.path.basename(self.current_file)}") # Debug
-        elif self.original_img_norm is not None:
+        elif self.original_img_u16 is not None:
             # Volles Bild mit Slider-Einstellungen verarbeiten
             try:
                 base = float(self.stretch_base_slider.get())
@@ -832,16 +1583,17 @@ class XISFViewer(tk.Tk):
             
             # Prüfen, ob transformiertes Bild bereits im Cache ist
             if self.last_transform_params is not None and np.allclose(self.last_transform_params, current_params) and self.cached_transformed is not None:
-                transformed = self.cached_transformed
+                img_scaled = self.cached_transformed
             else:
-                transformed = asinh_stretch(self.original_img_norm, effective_stretch)
-                transformed = np.power(transformed, 1/gamma if gamma != 0 else 1) # Div by zero guard
-                transformed = np.clip(transformed * brightness, 0, 1)
-                transformed = np.clip((transformed - 0.5) * contrast + 0.5, 0, 1)
-                self.cached_transformed = transformed
+                # Die ganze Kette als eine Tabellen-Abfrage pro Pixel
+                lut = self._build_tone_lut(effective_stretch, gamma, brightness, contrast, *self.original_img_range)
+                # Ausgabepuffer wiederverwenden, solange sich die Bildgröße nicht ändert (keine 24 MB pro Slider-Schritt)
+                img_scaled = apply_tone_lut(self.original_img_u16, lut, out=self._display_u8)
+                self._display_u8 = img_scaled
+                self.cached_transformed = img_scaled
                 self.last_transform_params = current_params
+            array_to_display = img_scaled
             
-            img_scaled = (transformed * 255).clip(0, 255).astype(np.uint8)
             if len(img_scaled.shape) == 2: # Graustufen
                 pil_image_to_display = Image.fromarray(img_scaled, mode='L')
             elif len(img_scaled.shape) == 3 and img_scaled.shape[2] == 3: # RGB (falls unterstützt)
@@ -860,29 +1612,40 @@ class XISFViewer(tk.Tk):
 
         if pil_image_to_display:
             try:
-                target_width = self.image_label.winfo_width()
-                target_height = self.image_label.winfo_height()
-
-                if target_width < 10 or target_height < 10: # Label noch nicht gezeichnet
-                    # Fallback auf eine vernünftige Größe, wenn das Label noch nicht initialisiert ist
-                    # Dies kann passieren, wenn update_display_image vor dem ersten Configure-Event aufgerufen wird.
-                    # Wir nehmen an, das Bild-Label nimmt ca. die Hälfte der Fensterbreite und 1/3 der Höhe ein.
-                    parent_width = self.left_top_frame.winfo_width() if self.left_top_frame.winfo_width() > 10 else self.winfo_width() // 2
-                    parent_height = self.left_top_frame.winfo_height() if self.left_top_frame.winfo_height() > 10 else self.winfo_height() // 1.5
-                    target_width = max(10, parent_width - 10) # Kleiner Puffer
-                    target_height = max(10, parent_height - 80) # Puffer für Slider
-
                 orig_width, orig_height = pil_image_to_display.size
                 if orig_width == 0 or orig_height == 0: return # Ungültige Bildgröße
 
-                scale = min(target_width / orig_width, target_height / orig_height)
-                new_size = (max(1, int(orig_width * scale)), max(1, int(orig_height * scale)))
+                # Zielgröße nur neu berechnen, wenn sich Label oder Bildgröße geändert haben
+                geometry_key = (self._label_size, (orig_width, orig_height))
+                if self._resize_geometry is not None and self._resize_geometry[0] == geometry_key:
+                    new_size, scale = self._resize_geometry[1]
+                else:
+                    target_width, target_height = self._display_target_size()
+                    scale = min(target_width / orig_width, target_height / orig_height)
+                    new_size = (max(1, int(orig_width * scale)), max(1, int(orig_height * scale)))
+                    if self._label_size is not None and min(self._label_size) >= 10:
+                        self._resize_geometry = (geometry_key, (new_size, scale))
                 
-                pil_resized = pil_image_to_display.resize(new_size, Image.Resampling.LANCZOS)
+                if cv2 is not None and array_to_display is not None and scale < 1:
+                    # INTER_AREA ist der passende Filter zum Verkleinern (SIMD + Threads in OpenCV)
+                    buf_shape = (new_size[1], new_size[0]) + array_to_display.shape[2:]
+                    if self._display_buf is None or self._display_buf.shape != buf_shape:
+                        self._display_buf = np.empty(buf_shape, dtype=np.uint8)
+                    cv2.resize(array_to_display, new_size, dst=self._display_buf, interpolation=cv2.INTER_AREA)
+                    pil_resized = Image.fromarray(self._display_buf)
+                else:
+                    pil_resized = pil_image_to_display.resize(new_size, Image.Resampling.LANCZOS)
                 
-                tk_image = ImageTk.PhotoImage(pil_resized)
-                self.image_label.configure(image=tk_image)
-                self.image_label.image = tk_image # Referenz behalten!
+                tk_image = getattr(self.image_label, "image", None)
+                tk_image_key = (pil_resized.mode, pil_resized.size)
+                if tk_image is not None and self._tk_image_key == tk_image_key:
+                    # Gleiche Größe: Pixel in das bestehende PhotoImage kopieren, Tk-Bild bleibt erhalten
+                    tk_image.paste(pil_resized)
+                else:
+                    tk_image = ImageTk.PhotoImage(pil_resized)
+                    self._tk_image_key = tk_image_key
+                    self.image_label.configure(image=tk_image)
+                    self.image_label.image = tk_image # Referenz behalten!
             except Exception as e:
                 # print(f"Error resizing or displaying image: {e}") # Debug
                 self.image_label.configure(image=None)
@@ -903,29 +1666,22 @@ class XISFViewer(tk.Tk):
             else:
                 return
 
-        # Dateien von unten nach oben löschen, um Indexprobleme zu vermeiden
-        files_to_move_paths = [self.active_files[i] for i in selected_indices]
-        
         folder = self.current_folder # Annahme: alle Dateien sind im selben Ordner
         pretrash_dir = os.path.join(folder, "PRETRASH")
         if not os.path.exists(pretrash_dir):
             os.makedirs(pretrash_dir)
 
         moved_count = 0
-        for file_path in sorted(files_to_move_paths, key=lambda p: self.active_files.index(p), reverse=True):
+        # Von unten nach oben über die Listbox-Indizes: frühere Indizes bleiben gültig, kein index()-Suchen (O(n²))
+        same_fs = same_filesystem(folder, pretrash_dir) # Einmal pro Vorgang statt pro Datei
+        for current_idx_of_file in sorted(selected_indices, reverse=True):
+            file_path = self.active_files[current_idx_of_file]
             try:
-                # Finde den tatsächlichen Index in der aktuellen Liste (kann sich geändert haben)
-                current_idx_of_file = self.active_files.index(file_path)
-
-                shutil.move(file_path, pretrash_dir)
+                move_into_dir(file_path, pretrash_dir, same_fs)
                 removed_file_path = self.active_files.pop(current_idx_of_file)
-                self.pretrash_files.append(os.path.join(pretrash_dir, os.path.basename(removed_file_path)))
-                
-                # Aus Caches entfernen
-                if removed_file_path in self.cache:
-                    del self.cache[removed_file_path]
-                if removed_file_path in self.preview_cache:
-                    del self.preview_cache[removed_file_path]
+                moved_file_path = os.path.join(pretrash_dir, os.path.basename(removed_file_path))
+                self.pretrash_files.append(moved_file_path)
+                self._move_cached_file(removed_file_path, moved_file_path) # Beim Wiederherstellen sofort wieder da
                 moved_count += 1
 
             except Exception as e:
@@ -933,8 +1689,8 @@ class XISFViewer(tk.Tk):
                 continue # Mit der nächsten Datei fortfahren
 
         if moved_count > 0:
-            self.active_files.sort(key=lambda s: s.lower()) # Nur nötig wenn nicht alle von pop betroffen sind
-            self.pretrash_files.sort(key=lambda s: s.lower())
+            # active_files bleibt durch pop sortiert; str.lower als Schlüssel ohne Lambda-Aufruf
+            self.pretrash_files.sort(key=str.lower)
             self.update_file_lists() # Listboxen aktualisieren
 
             if self.active_files:
@@ -958,7 +1714,7 @@ class XISFViewer(tk.Tk):
                         self.load_xisf_file(self.current_file, use_alignment=True)
                 else: # Keine aktiven Dateien mehr nach dem Löschen
                     self.current_file = None
-                    self.original_img_norm = None
+                    self._set_current_image(None)
                     self.image_label.configure(image=None)
                     self.image_label.image = None
                     self.fits_text.config(state=tk.NORMAL); self.fits_text.delete("1.0", tk.END); self.fits_text.config(state=tk.DISABLED)
@@ -966,7 +1722,7 @@ class XISFViewer(tk.Tk):
             else: # Keine aktiven Dateien mehr
                 self.current_file = None
                 self.current_index = None
-                self.original_img_norm = None
+                self._set_current_image(None)
                 self.image_label.configure(image=None)
                 self.image_label.image = None
                 self.fits_text.config(state=tk.NORMAL); self.fits_text.delete("1.0", tk.END); self.fits_text.config(state=tk.DISABLED)
@@ -980,19 +1736,17 @@ class XISFViewer(tk.Tk):
         if not sel:
             return
         
-        # Von unten nach oben wiederherstellen, um Indexprobleme zu vermeiden
-        files_to_restore_paths = [self.pretrash_files[i] for i in sel]
-        
         main_folder = self.current_folder # Der Ordner, in den wiederhergestellt wird
 
         restored_count = 0
         last_restored_file_in_active_list = None
 
-        for file_path in sorted(files_to_restore_paths, key=lambda p: self.pretrash_files.index(p), reverse=True):
+        # Von unten nach oben wiederherstellen, damit die übrigen Listbox-Indizes gültig bleiben
+        same_fs = same_filesystem(os.path.join(main_folder, "PRETRASH"), main_folder)
+        for current_idx_of_file in sorted(sel, reverse=True):
+            file_path = self.pretrash_files[current_idx_of_file]
             try:
-                current_idx_of_file = self.pretrash_files.index(file_path)
-
-                shutil.move(file_path, main_folder)
+                move_into_dir(file_path, main_folder, same_fs)
                 restored_file_basename = os.path.basename(file_path)
                 self.pretrash_files.pop(current_idx_of_file)
                 
@@ -1000,11 +1754,8 @@ class XISFViewer(tk.Tk):
                 # (oder sortiere am Ende einmal)
                 newly_restored_path = os.path.join(main_folder, restored_file_basename)
                 self.active_files.append(newly_restored_path)
+                self._move_cached_file(file_path, newly_restored_path) # Dekodiertes Bild und Vorschau weiterverwenden
                 last_restored_file_in_active_list = newly_restored_path # Merke dir die letzte wiederhergestellte Datei
-
-                # Caches für diese Datei leeren, da sie ggf. neu geladen/gepreviewed werden muss
-                if newly_restored_path in self.cache: del self.cache[newly_restored_path]
-                if newly_restored_path in self.preview_cache: del self.preview_cache[newly_restored_path]
                 
                 restored_count += 1
             except Exception as e:
@@ -1012,7 +1763,7 @@ class XISFViewer(tk.Tk):
                 continue
 
         if restored_count > 0:
-            self.active_files.sort(key=lambda s: s.lower())
+            self.active_files.sort(key=str.lower)
             # self.pretrash_files.sort(key=lambda s: s.lower()) # Ist bereits durch pop aktuell
             self.update_file_lists()
 
@@ -1107,8 +1858,10 @@ class XISFViewer(tk.Tk):
             "  4 = Max Visual Stretch\n\n"
             "Notes:\n"
             "- Ensure network drives are properly mounted.\n"
-            "- For XISF compressed files with shuffling, 'bitshuffle' library\n"
-            "  is recommended (pip install bitshuffle).\n"
+            "- For XISF compressed files with shuffling, 'numba' is\n"
+            "  recommended for fast unshuffling (pip install numba).\n"
+            "- ZSTD-compressed XISF files (newer PixInsight versions) need\n"
+            "  'zstandard' or 'cramjam' (pip install zstandard).\n"
             "- Preview caching runs in the background. Status is shown.\n"
         )
         label = tk.Label(help_win, text=help_text_content, fg="red", bg="black", font=("Arial", 13), justify="left", anchor="nw") # 13pt, nw anchor
@@ -1129,12 +1882,56 @@ class XISFViewer(tk.Tk):
         self.wait_window(help_win) # Wartet, bis das Hilfefenster geschlossen wird
 
 
+    def _get_header_info(self, file_path, kind=None):
+        """Liest FILTER/IMAGETYP/DATE-OBS einer Datei nur aus dem Header und merkt sie sich bis zur nächsten Änderung.
+        Bei XISF zusätzlich XML-Bytes, deren Position in der Datei und den geparsten Baum."""
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        cached = self._fits_hdr_cache.get(file_path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        if kind is None:
+            kind = classify_file(file_path)
+        if kind == FileKind.FITS:
+            info = read_fits_header_values(file_path, {"FILTER": None, "IMAGETYP": None, "DATE-OBS": None})
+        elif kind == FileKind.XISF:
+            xml_bytes, xml_start, xml_end = read_xisf_xml(file_path)
+            root = parse_xisf_root(xml_bytes)
+            info = {"FILTER": None, "IMAGETYP": None, "DATE-OBS": None}
+            missing = len(info)
+            for elem in root.iter(_FITSKEYWORD_TAG):
+                name = elem.get("name")
+                if name in info and info[name] is None: # Wie beim Schreiben zählt das erste Keyword eines Namens
+                    info[name] = elem.get("value", "").strip("'")
+                    missing -= 1
+                    if not missing: # Alle gefunden, Rest des Headers nicht mehr durchlaufen
+                        break
+            info["creation_time"] = None
+            for prop in root.iter(_PROPERTY_TAG):
+                if prop.get("id") == "XISF:CreationTime":
+                    info["creation_time"] = prop.get("value")
+                    break
+            info["xml_root"] = root
+            info["xml_bytes"] = xml_bytes
+            info["xml_bytes_range"] = (xml_start, xml_end)
+        else:
+            raise ValueError(f"Unsupported file type: {os.path.basename(file_path)}")
+        self._fits_hdr_cache[file_path] = (mtime_ns, info)
+        return info
+
+    def _center_over(self, child, parent):
+        """Zentriert ein Popup über einem anderen Fenster; ein update_idletasks und je eine Geometrie-Abfrage."""
+        child.update_idletasks() # Für korrekte Größenberechnung
+        pw, ph, px, py = map(int, _GEOMETRY_RE.match(parent.winfo_geometry()).groups())
+        cw, ch = map(int, _GEOMETRY_RE.match(child.winfo_geometry()).groups()[:2])
+        child.geometry(f"+{px + (pw - cw) // 2}+{py + (ph - ch) // 2}")
+
     def edit_fits_headers(self):
         sel = self.active_listbox.curselection()
         if not sel:
             messagebox.showerror("Error", "No files selected.")
             return
         selected_files = [self.active_files[idx] for idx in sel]
+        selected_kinds = [classify_file(f) for f in selected_files] # Dateityp einmal pro Datei bestimmen
         
         first_file = selected_files[0]
         filter_value = ""
@@ -1143,30 +1940,13 @@ class XISFViewer(tk.Tk):
         
         # Versuche, Header der ERSTEN ausgewählten Datei zu lesen
         try:
-            if first_file.lower().endswith(".fits"):
-                with fits.open(first_file) as hdulist:
-                    header = hdulist[0].header
-                    filter_value = header.get("FILTER", "")
-                    imagetyp_value = header.get("IMAGETYP", "LIGHT")
-                    date_value = header.get("DATE-OBS", "Unknown")
-            elif first_file.lower().endswith((".xisf", ".xifs")):
-                 with open(first_file, "rb") as f:
-                    file_bytes = f.read(8192) # Lese nur einen Teil für den Header
-                 header_data = parse_xisf_header(file_bytes) # Nutze die existierende Funktion
-                 xml_header_str = header_data["xml_header"]
-                 root = ET.fromstring(xml_header_str)
-                 # Namespaces können variieren, hier ein allgemeiner Ansatz
-                 for elem in root.findall(".//*[{http://www.pixinsight.com/xisf}FITSKeyword]"): # Finde FITSKeyword Elemente
-                    if elem.get("name") == "FILTER":
-                        filter_value = elem.get("value", "").strip("'")
-                    if elem.get("name") == "IMAGETYP":
-                        imagetyp_value = elem.get("value", "LIGHT").strip("'")
-                    if elem.get("name") == "DATE-OBS":
-                        date_value = elem.get("value", "Unknown").strip("'")
-                 if date_value == "Unknown": # Fallback für XISF-spezifische Zeit
-                    creation_time_elem = root.find(".//*[@id='XISF:CreationTime']")
-                    if creation_time_elem is not None:
-                        date_value = creation_time_elem.get("value", "Unknown")
+            if selected_kinds[0] != FileKind.OTHER:
+                info = self._get_header_info(first_file, selected_kinds[0])
+                filter_value = info["FILTER"] if info["FILTER"] is not None else ""
+                imagetyp_value = info["IMAGETYP"] if info["IMAGETYP"] is not None else "LIGHT"
+                date_value = info["DATE-OBS"] if info["DATE-OBS"] is not None else "Unknown"
+                if date_value == "Unknown" and info.get("creation_time") is not None: # Fallback für XISF-spezifische Zeit
+                    date_value = info["creation_time"]
             else: # Unbekannter Dateityp
                 messagebox.showwarning("Warning", f"Cannot read FITS-like headers from {os.path.basename(first_file)} (unsupported type).")
                 # Behalte Defaults
@@ -1183,55 +1963,74 @@ class XISFViewer(tk.Tk):
             info_text += f"\n(+{len(selected_files)-1} more)"
         info_text += f"\nDate: {date_value}"
         
-        info_label = tk.Label(edit_win, text=info_text,
-                              fg="red", bg="black", font=("Arial", 12), justify="left")
+        info_label = tk.Label(edit_win, text=info_text, justify="left", **LABEL_KW)
         info_label.pack(pady=(5,10), padx=10)
         
-        filter_label = tk.Label(edit_win, text="FILTER:", fg="red", bg="black", font=("Arial", 12))
+        filter_label = tk.Label(edit_win, text="FILTER:", **LABEL_KW)
         filter_label.pack(pady=(5,0))
-        filter_entry = tk.Entry(edit_win, fg="red", bg="black", insertbackground="red", font=("Arial", 12), width=20)
+        filter_entry = tk.Entry(edit_win, width=20, **ENTRY_KW)
         filter_entry.pack(pady=(0,10))
         filter_entry.insert(0, filter_value)
         
-        imagetyp_label = tk.Label(edit_win, text="IMAGETYP:", fg="red", bg="black", font=("Arial", 12))
+        imagetyp_label = tk.Label(edit_win, text="IMAGETYP:", **LABEL_KW)
         imagetyp_label.pack(pady=(5,0))
         imagetyp_options = ["LIGHT", "DARK", "FLAT", "BIAS", "OTHER"] # "OTHER" hinzugefügt
         imagetyp_var = tk.StringVar(value=imagetyp_value if imagetyp_value in imagetyp_options else "LIGHT")
         
-        # Style für OptionMenu
-        style = {"fg": "red", "bg": "black", "activebackground": "gray20", "font": ("Arial", 12), "highlightthickness":0, "borderwidth":1, "relief":"solid"}
         imagetyp_menu = tk.OptionMenu(edit_win, imagetyp_var, *imagetyp_options)
-        imagetyp_menu.config(**style)
-        imagetyp_menu["menu"].config(fg="red", bg="black", activebackground="gray20", font=("Arial",11))
+        imagetyp_menu.config(**OPTIONMENU_KW)
+        imagetyp_menu["menu"].config(**OPTIONMENU_MENU_KW)
         imagetyp_menu.pack(pady=(0,10))
         
         button_frame = tk.Frame(edit_win, bg="black")
         button_frame.pack(pady=10, fill=tk.X, padx=10)
 
-        apply_btn = tk.Button(button_frame, text="Preview & Apply", fg="red", bg="black", activebackground="gray20",
-                              command=lambda: self.preview_fits_headers(filter_entry.get(), imagetyp_var.get(), selected_files, edit_win),
-                              font=("Arial", 12))
+        apply_btn = tk.Button(button_frame, text="Preview & Apply",
+                              command=lambda: self.preview_fits_headers(filter_entry.get(), imagetyp_var.get(), selected_files, selected_kinds, edit_win),
+                              **BUTTON_KW)
         apply_btn.pack(side=tk.LEFT, expand=True, padx=5)
         
-        cancel_btn = tk.Button(button_frame, text="Cancel", fg="red", bg="black", activebackground="gray20",
-                               command=edit_win.destroy, font=("Arial", 12))
+        cancel_btn = tk.Button(button_frame, text="Cancel", command=edit_win.destroy, **BUTTON_KW)
         cancel_btn.pack(side=tk.RIGHT, expand=True, padx=5)
 
         edit_win.transient(self)
         edit_win.grab_set()
-        edit_win.update_idletasks() # Für korrekte Größenberechnung
-        # Zentriere das Popup über dem Hauptfenster
-        x = self.winfo_x() + (self.winfo_width() // 2) - (edit_win.winfo_width() // 2)
-        y = self.winfo_y() + (self.winfo_height() // 2) - (edit_win.winfo_height() // 2)
-        edit_win.geometry(f"+{x}+{y}")
+        self._center_over(edit_win, self) # Zentriere das Popup über dem Hauptfenster
         self.wait_window(edit_win)
 
 
-    def preview_fits_headers(self, filter_value, imagetyp_value, selected_files, edit_win):
+    def _read_old_values(self, file_path, kind):
+        """Alte FILTER/IMAGETYP-Werte einer Datei für die Vorschau: (filter, imagetyp, Fehler).
+        Läuft in Worker-Threads, daher keine Tk-Aufrufe."""
+        old_filter_val, old_imagetyp_val = "Not set", "Not set"
+        if kind == FileKind.OTHER:
+            return old_filter_val, old_imagetyp_val, None
+        try:
+            info = self._get_header_info(file_path, kind)
+        except Exception as e:
+            return old_filter_val, old_imagetyp_val, e
+        if info["FILTER"] is not None: old_filter_val = info["FILTER"]
+        if info["IMAGETYP"] is not None: old_imagetyp_val = info["IMAGETYP"]
+        return old_filter_val, old_imagetyp_val, None
+
+    def _open_preview_window(self):
+        """Zeigt das Vorschaufenster für Header-Änderungen. Es wird beim ersten Mal gebaut und danach nur
+        versteckt und wiederverwendet (Text-Widget und Tags bleiben erhalten, der Inhalt wird geleert)."""
+        preview_win = self._preview_win
+        if preview_win is not None and preview_win.winfo_exists():
+            preview_win.deiconify()
+            self._preview_text.config(state=tk.NORMAL)
+            self._preview_text.delete("1.0", tk.END)
+            if self._preview_controls is not None:
+                self._preview_controls.destroy()
+                self._preview_controls = None
+            return preview_win
+
         preview_win = tk.Toplevel(self)
         preview_win.title("Preview FITS Header Changes")
         preview_win.configure(bg="black")
         preview_win.geometry("500x400") # Breiter für bessere Übersicht
+        preview_win.protocol("WM_DELETE_WINDOW", self._close_preview_window)
         
         preview_text_frame = tk.Frame(preview_win, bg="black")
         preview_text_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -1248,198 +2047,298 @@ class XISFViewer(tk.Tk):
         preview_scroll_x.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
         preview_text.config(xscrollcommand=preview_scroll_x.set)
 
-        white_headers = {"IMAGETYP", "FILTER"} # Nur die geänderten hervorheben
         preview_text.tag_configure("white", foreground="white", font=("Monaco", 11, "bold"))
         preview_text.tag_configure("filename", foreground="yellow", font=("Monaco", 11, "bold"))
         preview_text.tag_configure("arrow", foreground="cyan")
         preview_text.tag_configure("nochange", foreground="gray60")
 
+        self._preview_win = preview_win
+        self._preview_text = preview_text
+        return preview_win
+
+    def _close_preview_window(self):
+        """Versteckt das Vorschaufenster zur Wiederverwendung und beendet das Warten in preview_fits_headers.
+        Während Header geschrieben werden, bricht es nur die noch ausstehenden Dateien ab; das Fenster schließt
+        sich, sobald die laufenden fertig sind (_finish_header_apply)."""
+        if self._header_apply_running:
+            self._cancel_header_apply()
+            return
+        if self._preview_win is not None and self._preview_win.winfo_exists():
+            self._preview_win.grab_release()
+            self._preview_win.withdraw()
+        self._preview_closed.set(True)
+
+    def preview_fits_headers(self, filter_value, imagetyp_value, selected_files, selected_kinds, edit_win):
+        preview_win = self._open_preview_window()
+        preview_text = self._preview_text
 
         changes_to_apply = [] # (file_path, 'FILTER'/'IMAGETYP', old_val, new_val)
 
-        for file_path in selected_files:
-            preview_text.insert(tk.END, f"File: {os.path.basename(file_path)}\n", "filename")
-            
-            old_filter_val, old_imagetyp_val = "Not set", "Not set"
-            is_fits = file_path.lower().endswith(".fits")
-            is_xisf = file_path.lower().endswith((".xisf", ".xifs"))
+        # Text und Tag-Bereiche erst sammeln, dann mit einem insert und einem tag_add pro Tag einfügen
+        parts = []
+        tag_ranges = {} # Tag -> [Start, Ende, Start, Ende, ...] als "Zeile.Spalte"-Indizes
+        line, col = 1, 0 # Position am Ende des bisher gesammelten Textes
+        def add_text(text, tag=None):
+            nonlocal line, col
+            parts.append(text)
+            start = f"{line}.{col}"
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                col = len(text) - text.rfind("\n") - 1
+            else:
+                col += len(text)
+            if tag:
+                # Direkte Zeile.Spalte-Indizes; "1.0 + N chars" müsste Tk jedes Mal vom Anfang aus abzählen
+                tag_ranges.setdefault(tag, []).extend((start, f"{line}.{col}"))
+
+        # Header parallel lesen (I/O-gebunden), das Text-Widget wird nur im Haupt-Thread befüllt
+        with ThreadPoolExecutor(max_workers=max(1, min(16, len(selected_files)))) as executor:
+            old_values = list(executor.map(self._read_old_values, selected_files, selected_kinds))
+
+        # Eingaben sind für alle Dateien gleich, nur einmal auswerten
+        requested_filter = filter_value.strip() # Neuer Wert aus Eingabefeld
+        has_filter_change_requested = bool(requested_filter)
+        requested_imagetyp = imagetyp_value # Neuer Wert aus Dropdown
+
+        for file_path, kind, (old_filter_val, old_imagetyp_val, read_error) in zip(selected_files, selected_kinds, old_values):
+            add_text(f"File: {os.path.basename(file_path)}\n", "filename")
+
+            if kind == FileKind.OTHER: # Sollte nicht passieren, da wir nur .fits/.xisf bearbeiten
+                add_text("  Unsupported file type for header editing.\n")
+                add_text(_SEP)
+                continue
+            if read_error is not None:
+                add_text(f"  Error reading/parsing {os.path.basename(file_path)}: {read_error}\n")
+                add_text(_SEP)
+                continue
 
             try:
-                if is_fits:
-                    with fits.open(file_path) as hdul:
-                        header = hdul[0].header
-                        old_filter_val = header.get("FILTER", "Not set")
-                        old_imagetyp_val = header.get("IMAGETYP", "Not set")
-                elif is_xisf:
-                    with open(file_path, "rb") as f_xisf:
-                        xml_header_str = parse_xisf_header(f_xisf.read(8192))["xml_header"]
-                    root = ET.fromstring(xml_header_str)
-                    for elem in root.findall(".//*[{http://www.pixinsight.com/xisf}FITSKeyword]"):
-                        if elem.get("name") == "FILTER": old_filter_val = elem.get("value", "Not set").strip("'")
-                        if elem.get("name") == "IMAGETYP": old_imagetyp_val = elem.get("value", "Not set").strip("'")
-                else: # Sollte nicht passieren, da wir nur .fits/.xisf bearbeiten
-                    preview_text.insert(tk.END, "  Unsupported file type for header editing.\n")
-                    preview_text.insert(tk.END, "-" * 60 + "\n")
-                    continue
-
                 # FILTER
-                final_filter_val = filter_value.strip() # Neuer Wert aus Eingabefeld
-                if final_filter_val == "" and old_filter_val != "Not set" : # Wenn Feld leer, behalte alten Wert, außer alter Wert war "Not set"
-                    final_filter_val = old_filter_val
+                # Wenn Feld leer, behalte alten Wert, außer alter Wert war "Not set"
+                final_filter_val = requested_filter if has_filter_change_requested or old_filter_val == "Not set" else old_filter_val
                 
                 if old_filter_val != final_filter_val:
-                    preview_text.insert(tk.END, "  FILTER:   '", "white")
-                    preview_text.insert(tk.END, f"{old_filter_val}", "nochange" if old_filter_val=="Not set" else "")
-                    preview_text.insert(tk.END, "'", "white")
-                    preview_text.insert(tk.END, "  ->  '", "arrow")
-                    preview_text.insert(tk.END, f"{final_filter_val}", "white")
-                    preview_text.insert(tk.END, "'\n", "white")
-                    changes_to_apply.append({'file': file_path, 'keyword': 'FILTER', 'new_value': final_filter_val, 'is_fits': is_fits, 'is_xisf': is_xisf})
+                    add_text("  FILTER:   '", "white")
+                    add_text(f"{old_filter_val}", "nochange" if old_filter_val=="Not set" else "")
+                    add_text("'", "white")
+                    add_text("  ->  '", "arrow")
+                    add_text(f"{final_filter_val}", "white")
+                    add_text("'\n", "white")
+                    changes_to_apply.append({'file': file_path, 'keyword': 'FILTER', 'new_value': final_filter_val, 'kind': kind})
                 else:
-                    preview_text.insert(tk.END, f"  FILTER:   '{old_filter_val}' (no change)\n", "nochange")
+                    add_text(f"  FILTER:   '{old_filter_val}' (no change)\n", "nochange")
 
                 # IMAGETYP
-                final_imagetyp_val = imagetyp_value # Neuer Wert aus Dropdown
+                final_imagetyp_val = requested_imagetyp
                 if old_imagetyp_val != final_imagetyp_val:
-                    preview_text.insert(tk.END, "  IMAGETYP: '", "white")
-                    preview_text.insert(tk.END, f"{old_imagetyp_val}", "nochange" if old_imagetyp_val=="Not set" else "")
-                    preview_text.insert(tk.END, "'", "white")
-                    preview_text.insert(tk.END, "  ->  '", "arrow")
-                    preview_text.insert(tk.END, f"{final_imagetyp_val}", "white")
-                    preview_text.insert(tk.END, "'\n", "white")
-                    changes_to_apply.append({'file': file_path, 'keyword': 'IMAGETYP', 'new_value': final_imagetyp_val, 'is_fits': is_fits, 'is_xisf': is_xisf})
+                    add_text("  IMAGETYP: '", "white")
+                    add_text(f"{old_imagetyp_val}", "nochange" if old_imagetyp_val=="Not set" else "")
+                    add_text("'", "white")
+                    add_text("  ->  '", "arrow")
+                    add_text(f"{final_imagetyp_val}", "white")
+                    add_text("'\n", "white")
+                    changes_to_apply.append({'file': file_path, 'keyword': 'IMAGETYP', 'new_value': final_imagetyp_val, 'kind': kind})
                 else:
-                    preview_text.insert(tk.END, f"  IMAGETYP: '{old_imagetyp_val}' (no change)\n", "nochange")
+                    add_text(f"  IMAGETYP: '{old_imagetyp_val}' (no change)\n", "nochange")
 
             except Exception as e:
-                preview_text.insert(tk.END, f"  Error reading/parsing {os.path.basename(file_path)}: {e}\n")
+                add_text(f"  Error reading/parsing {os.path.basename(file_path)}: {e}\n")
             
-            preview_text.insert(tk.END, "-" * 60 + "\n")
-        
+            add_text(_SEP)
+
+        preview_text.insert(tk.END, "".join(parts))
+        for tag, ranges in tag_ranges.items():
+            preview_text.tag_add(tag, *ranges)
+
         preview_text.config(state=tk.DISABLED)
         
+        # Knopfleiste (und später der Fortschrittsbalken) wird pro Öffnen neu gebaut, sie hängt von den Änderungen ab
         button_frame_preview = tk.Frame(preview_win, bg="black")
         button_frame_preview.pack(pady=5, fill=tk.X, padx=10)
+        self._preview_controls = button_frame_preview
+        self._preview_confirm_btn = None
 
         if not changes_to_apply:
-             no_changes_label = tk.Label(button_frame_preview, text="No changes to apply.", fg="yellow", bg="black", font=("Arial", 12))
+             no_changes_label = tk.Label(button_frame_preview, text="No changes to apply.", **dict(LABEL_KW, fg="yellow"))
              no_changes_label.pack(side=tk.LEFT, padx=5)
         else:
-            confirm_btn = tk.Button(button_frame_preview, text=f"Confirm {len(changes_to_apply)} Change(s)", fg="red", bg="black", activebackground="gray20",
+            confirm_btn = tk.Button(button_frame_preview, text=f"Confirm {len(changes_to_apply)} Change(s)",
                                     command=lambda: self.apply_fits_headers_confirmed(changes_to_apply, edit_win, preview_win, selected_files),
-                                    font=("Arial", 12))
+                                    **BUTTON_KW)
             confirm_btn.pack(side=tk.LEFT, expand=True, padx=5)
+            self._preview_confirm_btn = confirm_btn
         
-        cancel_btn = tk.Button(button_frame_preview, text="Cancel", fg="red", bg="black", activebackground="gray20",
-                               command=preview_win.destroy, font=("Arial", 12))
+        cancel_btn = tk.Button(button_frame_preview, text="Cancel", command=self._close_preview_window, **BUTTON_KW)
         cancel_btn.pack(side=tk.RIGHT, expand=True, padx=5)
 
         preview_win.transient(edit_win) # Modal zum Edit-Fenster
         preview_win.grab_set()
-        preview_win.update_idletasks()
-        x = edit_win.winfo_x() + (edit_win.winfo_width() // 2) - (preview_win.winfo_width() // 2)
-        y = edit_win.winfo_y() + (edit_win.winfo_height() // 2) - (preview_win.winfo_height() // 2)
-        preview_win.geometry(f"+{x}+{y}")
-        self.wait_window(preview_win)
-
-
-    def apply_fits_headers_confirmed(self, changes, edit_win, preview_win, selected_files_paths_for_reload):
-        success_count = 0
-        fail_count = 0
-        
-        for change_item in changes:
-            file_path = change_item['file']
-            keyword = change_item['keyword']
-            new_value = change_item['new_value']
-            is_fits_file = change_item['is_fits']
-            is_xisf_file = change_item['is_xisf']
+        self._center_over(preview_win, edit_win)
+        self._preview_closed.set(False)
+        self.wait_variable(self._preview_closed) # Fenster wird beim Schließen nur versteckt, nicht zerstört
 
-            try:
-                if is_fits_file:
-                    with fits.open(file_path, mode='update') as hdulist:
-                        hdulist[0].header[keyword] = new_value
-                        hdulist.flush() # Speichert Änderungen in die Datei
-                    success_count +=1
-                elif is_xisf_file:
-                    # XISF: XML parsen, ändern, neu schreiben (komplexer)
-                    # Dies erfordert das Lesen der gesamten Datei, Ändern des XML-Teils und Zurückschreiben.
-                    # Vorsicht: Dies ist eine heikle Operation. Backup empfohlen.
-                    with open(file_path, "rb") as f:
-                        content_bytes = f.read()
-                    
-                    # Finde XML Header Grenzen
-                    xml_start_token = b"<?xml"
-                    xml_end_token = b"</xisf>"
-                    xml_start_offset = content_bytes.find(xml_start_token)
-                    xml_end_offset = content_bytes.find(xml_end_token)
-
-                    if xml_start_offset == -1 or xml_end_offset == -1:
-                        raise ValueError("Could not find full XML header in XISF.")
-                    
-                    xml_end_offset += len(xml_end_token) # Inklusive End-Tag
 
-                    xml_string_original = content_bytes[xml_start_offset:xml_end_offset].decode('utf-8')
-                    
-                    # Parse XML
-                    root = ET.fromstring(xml_string_original)
-                    ns_xisf = "http://www.pixinsight.com/xisf" # Namespace explizit
-                    
-                    keyword_found_and_updated = False
-                    # Versuche, existierendes Keyword zu aktualisieren
-                    for kw_elem in root.findall(f".//{{{ns_xisf}}}FITSKeyword[@name='{keyword}']"):
-                        kw_elem.set("value", str(new_value)) # Sicherstellen, dass Wert ein String ist
-                        keyword_found_and_updated = True
-                        break # Annahme: Nur ein Keyword mit diesem Namen ist relevant oder das erste gefundene
+    def _apply_header_changes(self, file_path, kind, kw_map):
+        """Schreibt alle Keyword-Änderungen einer Datei und liefert (ok, Fehlertext).
+        Läuft in Worker-Threads, daher keine Tk-Aufrufe."""
+        try:
+            if kind == FileKind.OTHER:
+                return False, "Unsupported file type for header editing." # Sollte nicht passieren
+            # Mit den gecachten Header-Werten vergleichen: was schon so in der Datei steht, wird nicht geschrieben
+            info = self._get_header_info(file_path, kind)
+            kw_changed = {keyword: new_value for keyword, new_value in kw_map.items()
+                          if info.get(keyword) is None or str(info[keyword]).strip("'") != str(new_value)}
+            if not kw_changed:
+                return True, None # Nichts zu tun, Datei bleibt unangetastet
+
+            if kind == FileKind.FITS:
+                write_fits_header_values(file_path, kw_changed) # Nur der Header wird geschrieben
+            else:
+                # XISF: XML parsen, ändern, neu schreiben (komplexer)
+                # Header nur bis </xisf> lesen; die Bilddaten werden nur umkopiert, wenn der neue Header nicht mehr vor sie passt.
+                # Vorsicht: Dies ist eine heikle Operation. Backup empfohlen.
+                # Header-Bytes und Position aus dem Cache der Vorschau, sofern die Datei unverändert ist
+                xml_start_offset, xml_end_offset = info["xml_bytes_range"]
+                # Geparsten Baum der Vorschau direkt ändern, der Cache-Eintrag wird danach ohnehin verworfen
+                root = info["xml_root"]
+                
+                # Alle Keywords der Datei in einem Durchlauf über die FITSKeyword-Elemente aktualisieren
+                pending = dict(kw_changed)
+                for kw_elem in root.iter(_FITSKEYWORD_TAG):
+                    keyword = kw_elem.get("name")
+                    if keyword in pending:
+                        # Nur das erste Keyword mit diesem Namen ist relevant
+                        kw_elem.set("value", str(pending.pop(keyword))) # Sicherstellen, dass Wert ein String ist
+                        if not pending:
+                            break
+
+                if pending:
+                    # Keywords nicht gefunden, füge sie hinzu
+                    # Finde das <Image> oder ein anderes passendes Elternelement, um Keywords anzuhängen
+                    image_element = root.find(_XISF_IMAGE_PATH)
+                    if image_element is None: # Fallback, falls <Image> nicht direkt unter root ist
+                        image_element = root 
                     
-                    if not keyword_found_and_updated:
-                        # Keyword nicht gefunden, füge es hinzu
-                        # Finde das <Image> oder ein anderes passendes Elternelement, um Keywords anzuhängen
-                        image_element = root.find(f".//{{{ns_xisf}}}Image")
-                        if image_element is None: # Fallback, falls <Image> nicht direkt unter root ist
-                            image_element = root 
-                        
-                        new_kw_elem = ET.Element(f"{{{ns_xisf}}}FITSKeyword")
+                    for keyword, new_value in pending.items():
+                        new_kw_elem = image_element.makeelement(_FITSKEYWORD_TAG, {}) # Gleiche Baum-Implementierung (lxml oder ET)
                         new_kw_elem.set("name", keyword)
                         new_kw_elem.set("value", str(new_value))
                         new_kw_elem.set("comment", f"Set by XISFViewer") # Optionaler Kommentar
                         image_element.append(new_kw_elem) # Hänge es an <Image> oder root an
 
-                    # XML zurück in String umwandeln
-                    # ET.register_namespace('', ns_xisf) # Für sauberes XML ohne 'ns0:' Präfixe, falls nötig
-                    modified_xml_string = ET.tostring(root, encoding='utf-8', method='xml').decode('utf-8')
-                    
-                    # Stelle sicher, dass der XML-Header mit <?xml version="1.0" encoding="UTF-8"?> beginnt
-                    if not modified_xml_string.startswith("<?xml"):
-                        modified_xml_string = '<?xml version="1.0" encoding="UTF-8"?>\n' + modified_xml_string
-
-                    modified_xml_bytes = modified_xml_string.encode('utf-8')
+                modified_xml_bytes = serialize_xisf_root(root)
+                write_xisf_xml(file_path, modified_xml_bytes, xml_start_offset, xml_end_offset)
+            return True, None
+        except Exception as e:
+            return False, str(e)
 
-                    # Kombiniere den neuen Header mit dem Rest der Datei
-                    new_content_bytes = content_bytes[:xml_start_offset] + modified_xml_bytes + content_bytes[xml_end_offset:]
+    def apply_fits_headers_confirmed(self, changes, edit_win, preview_win, selected_files_paths_for_reload):
+        if self._header_apply_running: # Erneuter Klick auf "Confirm", während noch geschrieben wird
+            return
 
-                    with open(file_path, "wb") as f_write:
-                        f_write.write(new_content_bytes)
-                    success_count +=1
-                else:
-                    fail_count += 1 # Sollte nicht passieren
-                    continue
-
-                # Header-Cache für die bearbeitete Datei invalidieren, damit er neu gelesen wird
-                if file_path == self.current_file:
-                    self.xml_header = None # Für XISF
-                # Auch den normalen Bild-Cache invalidieren, falls das Laden des Headers dort Infos setzt
-                if file_path in self.cache:
-                    del self.cache[file_path]
-                # Preview-Cache nicht unbedingt nötig, da Previews keine Header-Infos zeigen
-                
+        # Änderungen pro Datei bündeln: jede Datei wird nur einmal geöffnet und geschrieben
+        grouped = defaultdict(dict) # file_path -> {keyword: new_value}
+        file_kinds = {} # file_path -> FileKind
+        for change_item in changes:
+            grouped[change_item['file']][change_item['keyword']] = change_item['new_value']
+            file_kinds[change_item['file']] = change_item['kind']
+
+        # Dateien im Hintergrund schreiben, die Oberfläche bleibt bedienbar und zeigt den Fortschritt
+        progress = ttk.Progressbar(self._preview_controls or preview_win, mode="determinate", maximum=len(grouped))
+        progress.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        if self._preview_confirm_btn is not None and self._preview_confirm_btn.winfo_exists():
+            self._preview_confirm_btn.config(state=tk.DISABLED) # Cancel bleibt aktiv und stoppt ausstehende Dateien
+        self._header_apply_running = True
+        executor = ThreadPoolExecutor(max_workers=4)
+        self._header_apply_executor = executor
+        futures = {file_path: executor.submit(self._apply_header_changes, file_path, file_kinds[file_path], kw_map)
+                   for file_path, kw_map in grouped.items()}
+        executor.shutdown(wait=False)
+
+        def poll():
+            if self._closing: # Hauptfenster wird geschlossen, on_close hat ausstehende Dateien verworfen
+                return
+            done_count = sum(future.done() for future in futures.values())
+            if progress.winfo_exists():
+                progress["value"] = done_count
+            if done_count < len(futures):
+                self.after(50, poll)
+                return
+            self._header_apply_running = False
+            self._header_apply_executor = None
+            results = {file_path: (False, "Cancelled, file not changed") if future.cancelled() else future.result()
+                       for file_path, future in futures.items()}
+            self._finish_header_apply(grouped, results, edit_win, preview_win, selected_files_paths_for_reload)
+
+        poll()
+
+    def _cancel_header_apply(self):
+        """Verwirft noch nicht begonnene Dateien der laufenden Header-Änderung; begonnene werden fertig geschrieben."""
+        if self._header_apply_executor is not None:
+            self._header_apply_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _refresh_current_header(self):
+        """Zeigt den Header der aktuellen Datei nach einer Header-Änderung neu an, ohne das Bild neu zu dekodieren."""
+        if classify_file(self.current_file) == FileKind.XISF:
+            try:
+                self.xml_header = read_xisf_header(self.current_file, need_xml_text=True)["xml_header"] # Nur den Header lesen
             except Exception as e:
-                fail_count += 1
-                messagebox.showerror("Error Applying Change", f"Failed to update '{keyword}' for {os.path.basename(file_path)}:\n{e}")
-        
-        edit_win.destroy()
-        preview_win.destroy()
+                self.xml_header = f"Error reading XISF XML header: {e}"
+        self.update_fits_header() # FITS-Header liest update_fits_header direkt aus der Datei
+
+    def _show_header_errors(self, errors):
+        """Zeigt alle Fehler der Header-Änderung gesammelt in einem scrollbaren, schreibgeschützten Fenster."""
+        error_win = tk.Toplevel(self)
+        error_win.title("FITS Header Update Errors")
+        error_win.configure(bg="black")
+        error_win.geometry("700x300")
+
+        error_frame = tk.Frame(error_win, bg="black")
+        error_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        error_text = tk.Text(error_frame, font=("Monaco", 11), wrap=tk.NONE, fg="red", bg="black",
+                             borderwidth=1, relief="solid")
+        error_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        error_scroll_y = tk.Scrollbar(error_frame, command=error_text.yview, bg="black", troughcolor="gray20")
+        error_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        error_text.config(yscrollcommand=error_scroll_y.set)
+
+        # Ein einziges Insert statt einer Zeile pro Fehler
+        error_text.insert("1.0", "\n".join(f"{os.path.basename(file_path)}: {err}" for file_path, err in errors))
+        error_text.config(state=tk.DISABLED)
+
+        tk.Button(error_win, text="Close", command=error_win.destroy, **BUTTON_KW).pack(pady=5)
+        self._center_over(error_win, self)
+
+    def _finish_header_apply(self, grouped, results, edit_win, preview_win, selected_files_paths_for_reload):
+        """Wertet die Ergebnisse der Worker aus (Haupt-Thread): Caches invalidieren, eine Zusammenfassung zeigen."""
+        success_count = 0
+        fail_count = 0
+        errors = [] # (Datei, Fehler) pro fehlgeschlagener Datei, gesammelt statt einzelner Fehlerdialoge
+
+        for file_path, (ok, error) in results.items():
+            kw_map = grouped[file_path]
+            self._fits_hdr_cache.pop(file_path, None) # Datei geändert oder evtl. halb geschrieben
+            if not ok:
+                fail_count += len(kw_map)
+                errors.append((file_path, f"({', '.join(kw_map)}) {error}"))
+                continue
+            success_count += len(kw_map)
+
+            # Header-Cache für die bearbeitete Datei invalidieren, damit er neu gelesen wird
+            if file_path == self.current_file:
+                self.xml_header = None # Für XISF
+            self._file_sizes.pop(file_path, None) # Größe kann sich durch den neuen Header geändert haben
+            # Bild- und Preview-Cache bleiben gültig: sie enthalten nur Pixeldaten, und die ändern sich nicht
+
+        self._close_preview_window()
+        if edit_win.winfo_exists():
+            edit_win.destroy()
         
         summary_message = f"Header changes applied.\nSuccessful: {success_count}\nFailed: {fail_count}"
+        if errors:
+            summary_message += f"\n\n{len(errors)} file(s) could not be updated, see the error list."
+            self._show_header_errors(errors)
         if fail_count > 0:
             messagebox.showwarning("FITS Header Update Summary", summary_message)
         else:
@@ -1449,6 +2348,9 @@ class XISFViewer(tk.Tk):
         if selected_files_paths_for_reload:
             last_file_processed = selected_files_paths_for_reload[-1] # Die letzte Datei aus der ursprünglichen Auswahl
             if last_file_processed in self.active_files: # Sicherstellen, dass sie noch in der aktiven Liste ist
+                # Ist sie bereits angezeigt und wurde fehlerfrei geschrieben, reicht es, den Header neu anzuzeigen
+                header_only = (last_file_processed == self.current_file and self.original_img_u16 is not None
+                               and results.get(last_file_processed, (True, None))[0])
                 self.current_index = self.active_files.index(last_file_processed)
                 self.current_file = last_file_processed
                 
@@ -1456,12 +2358,15 @@ class XISFViewer(tk.Tk):
                 self.active_listbox.selection_set(self.current_index)
                 self.active_listbox.activate(self.current_index)
                 
-                self.displaying_preview = self.current_file in self.preview_cache # Check für Preview
-                if self.current_file.lower().endswith(".fits"):
-                    self.load_fits_file(self.current_file)
-                elif self.current_file.lower().endswith((".xisf", ".xifs")):
-                     self.load_xisf_file(self.current_file, use_alignment=True) # use_alignment kann hier wichtig sein
-                # update_fits_header und update_display_image werden von den load_xxx_file Methoden aufgerufen.
+                if header_only:
+                    self._refresh_current_header()
+                else:
+                    self.displaying_preview = self.current_file in self.preview_cache # Check für Preview
+                    if self.current_file.lower().endswith(".fits"):
+                        self.load_fits_file(self.current_file)
+                    elif self.current_file.lower().endswith((".xisf", ".xifs")):
+                         self.load_xisf_file(self.current_file, use_alignment=True) # use_alignment kann hier wichtig sein
+                    # update_fits_header und update_display_image werden von den load_xxx_file Methoden aufgerufen.
             elif self.active_files: # Fallback: Lade die erste Datei, wenn die letzte nicht mehr da ist
                 self.current_index = 0
                 self.current_file = self.active_files[0]